@@ -0,0 +1,188 @@
+"""
+Tutorial: Cluster quality metrics that scale to large datasets
+
+- silhouette_score: exact mean silhouette, computed by tiles of rows and
+  columns sized from a memory budget (max_bytes), so that only one tile of
+  distances exists at any time, never the full n x n matrix;
+- silhouette_sample: estimate of the same value from a sample stratified by
+  cluster, with the half-width of a confidence interval;
+- davies_bouldin: Davies-Bouldin index (lower is better);
+- adjusted_rand_index: agreement with known labels (1 = identical partitions,
+  about 0 = random), from a contingency table built with np.bincount.
+
+Data is an (n, d) array of points and labels an array of n cluster numbers.
+
+Usage:
+    from cluster_metrics import clusters_to_labels, silhouette_score
+    points, labels = clusters_to_labels(clusters)
+    print(silhouette_score(points, labels))
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+
+
+MAX_BYTES = 64 * 2**20  # default memory budget of a tile of distances
+
+
+def clusters_to_labels(clusters):
+    """Convert a list of clusters (lists of points) into (points, labels) arrays."""
+    points = np.array([p for cluster in clusters for p in cluster], dtype=float)
+    labels = np.repeat(np.arange(len(clusters)), [len(c) for c in clusters])
+    return points, labels
+
+
+def _encode(labels):
+    """Return (codes, k): labels renumbered 0..k-1."""
+    uniques, codes = np.unique(np.asarray(labels), return_inverse=True)
+    return codes.ravel(), len(uniques)
+
+
+def _distances(a, a_sq_norms, b, b_sq_norms):
+    """Euclidean distances between the rows of a and the rows of b (a single array allocated)."""
+    sq = a @ b.T
+    sq *= -2
+    sq += a_sq_norms[:, None]
+    sq += b_sq_norms[None, :]
+    np.maximum(sq, 0, out=sq)
+    return np.sqrt(sq, out=sq)
+
+
+def _silhouettes(points, codes, k, rows, chunk_size, max_bytes):
+    """Silhouette values of the points at the given row indices."""
+    n = len(points)
+    sizes = np.bincount(codes, minlength=k)
+    sq_norms = np.einsum("ij,ij->i", points, points)
+    # a tile of distances is (rows x columns) float64 values, plus its
+    # (columns x k) one-hot matrix
+    cells = max(1, max_bytes // 8)
+    chunk_size = max(1, min(chunk_size, cells))
+    tile = max(1, min(n, cells // (chunk_size + k)))
+
+    values = np.empty(len(rows))
+    for start in range(0, len(rows), chunk_size):
+        block = rows[start:start + chunk_size]
+        block_points = points[block]
+        block_norms = sq_norms[block]
+        # sum of the distances from each point of the block to each cluster
+        sums = np.zeros((len(block), k))
+        for col in range(0, n, tile):
+            cols = slice(col, col + tile)
+            one_hot = np.zeros((len(codes[cols]), k))
+            one_hot[np.arange(len(one_hot)), codes[cols]] = 1
+            sums += _distances(block_points, block_norms, points[cols], sq_norms[cols]) @ one_hot
+        own = codes[block]
+        own_size = sizes[own]
+        a = sums[np.arange(len(block)), own] / np.maximum(own_size - 1, 1)
+        means = sums / np.maximum(sizes, 1)
+        means[np.arange(len(block)), own] = np.inf
+        means[:, sizes == 0] = np.inf
+        b = means.min(axis=1)
+        s = (b - a) / np.maximum(np.maximum(a, b), np.finfo(float).tiny)
+        # a point alone in its cluster has a silhouette of 0 by convention
+        s[own_size == 1] = 0
+        values[start:start + len(block)] = s
+    return values
+
+
+def silhouette_score(points, labels, chunk_size=1024, max_bytes=MAX_BYTES):
+    """
+    Return the exact mean silhouette, computed by blocks of at most
+    chunk_size rows, each tile of distances taking at most about max_bytes.
+    """
+    points = np.asarray(points, dtype=float)
+    codes, k = _encode(labels)
+    if not 2 <= k < len(points):
+        raise ValueError("silhouette needs between 2 and n - 1 clusters")
+    rows = np.arange(len(points))
+    return float(_silhouettes(points, codes, k, rows, chunk_size, max_bytes).mean())
+
+
+def silhouette_sample(points, labels, sample_size=10000, confidence=0.95,
+                      chunk_size=1024, seed=None, max_bytes=MAX_BYTES):
+    """
+    Estimate the mean silhouette from a sample stratified by cluster
+    (each cluster is sampled in proportion to its size, at least 2 points).
+    Return (estimate, half_width): the true value lies in
+    estimate +/- half_width with the given confidence.
+    """
+    points = np.asarray(points, dtype=float)
+    codes, k = _encode(labels)
+    if not 2 <= k < len(points):
+        raise ValueError("silhouette needs between 2 and n - 1 clusters")
+    n = len(points)
+    rng = np.random.default_rng(seed)
+    sizes = np.bincount(codes, minlength=k)
+
+    strata = []
+    for c in range(k):
+        members = np.flatnonzero(codes == c)
+        m = min(sizes[c], max(2, round(sample_size * sizes[c] / n)))
+        strata.append(rng.choice(members, size=m, replace=False))
+    rows = np.concatenate(strata)
+    values = _silhouettes(points, codes, k, rows, chunk_size, max_bytes)
+
+    estimate = 0.0
+    variance = 0.0
+    start = 0
+    for c, chosen in enumerate(strata):
+        s = values[start:start + len(chosen)]
+        start += len(chosen)
+        weight = sizes[c] / n
+        estimate += weight * s.mean()
+        if len(s) > 1:
+            # finite population correction: a fully sampled cluster adds no error
+            fpc = 1 - len(s) / sizes[c]
+            variance += weight ** 2 * s.var(ddof=1) / len(s) * fpc
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return float(estimate), float(z * np.sqrt(variance))
+
+
+def davies_bouldin(points, labels):
+    """Return the Davies-Bouldin index (average similarity of each cluster to its closest one)."""
+    points = np.asarray(points, dtype=float)
+    codes, k = _encode(labels)
+    if k < 2:
+        raise ValueError("Davies-Bouldin needs at least 2 clusters")
+    sizes = np.bincount(codes, minlength=k)
+    centroids = np.zeros((k, points.shape[1]))
+    np.add.at(centroids, codes, points)
+    centroids /= sizes[:, None]
+
+    # average distance of the points of each cluster to its centroid
+    scatter = np.bincount(codes, weights=np.linalg.norm(points - centroids[codes], axis=1),
+                          minlength=k) / sizes
+    separation = np.linalg.norm(centroids[:, None, :] - centroids[None, :, :], axis=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = (scatter[:, None] + scatter[None, :]) / separation
+    np.fill_diagonal(ratios, -np.inf)
+    ratios[np.isnan(ratios)] = np.inf
+    return float(ratios.max(axis=1).mean())
+
+
+def adjusted_rand_index(labels_true, labels_pred):
+    """Return the adjusted Rand index between two labelings of the same points."""
+    true_codes, k_true = _encode(labels_true)
+    pred_codes, k_pred = _encode(labels_pred)
+    n = len(true_codes)
+    if n != len(pred_codes):
+        raise ValueError("both labelings must have the same length")
+
+    contingency = np.bincount(true_codes * k_pred + pred_codes,
+                              minlength=k_true * k_pred).reshape(k_true, k_pred)
+
+    def pairs(counts):
+        counts = counts.astype(np.float64)
+        return float((counts * (counts - 1) / 2).sum())
+
+    index = pairs(contingency)
+    rows = pairs(contingency.sum(axis=1))
+    cols = pairs(contingency.sum(axis=0))
+    total = n * (n - 1) / 2
+    expected = rows * cols / total if total else 0.0
+    maximum = (rows + cols) / 2
+    if maximum == expected:
+        # both partitions are trivial (a single cluster, or all singletons)
+        return 1.0
+    return (index - expected) / (maximum - expected)
@@ -9,6 +9,8 @@ from mpl_toolkits import mplot3d
 import numpy as np
 import csv
 
+from cluster_metrics import adjusted_rand_index, davies_bouldin, silhouette_score
+
 
 def distance(p, q):
     """Compute Euclidean distance between two points of any dimension."""
@@ -34,7 +36,10 @@ def repartition(data, barycentres):
 
 
 def kmeans(data, k, max_iter=100):
-    """Run K-means algorithm until stabilization or max_iter reached."""
+    """
+    Run K-means algorithm until stabilization or max_iter reached.
+    For large NumPy arrays (float32, np.memmap), use kmeans_array instead.
+    """
     barycentres = sample(data, k)
     for _ in range(max_iter):
         clusters = repartition(data, barycentres)
@@ -45,24 +50,146 @@ def kmeans(data, k, max_iter=100):
     return clusters, barycentres
 
 
-def plot_kmeans_result(clusters, barycentres):
-    """Display 3D scatter plot of clusters and barycenters."""
+def kmeans_array(data, k, max_iter=100, chunk_size=65536, seed=None):
+    """
+    K-means on an (n, d) NumPy array, returning (labels, barycentres).
+    The data is read by chunks of rows and never copied as a whole, so it can
+    be a float32 array or a np.memmap of a file larger than memory. Distances
+    are computed in the data type (float32 halves the memory traffic; integer
+    data, such as uint8 features, is converted chunk by chunk to float32),
+    while the sums giving the new barycentres are accumulated in float64.
+    Points and centres are first shifted by the mean of the centres, so that
+    float32 distances stay accurate for data far from the origin (e.g. blobs
+    around 1e4 a few units apart).
+    A cluster that becomes empty keeps its previous barycentre.
+    """
+    if not isinstance(data, np.ndarray):
+        data = np.asarray(data, dtype=np.float64)
+    n, dim = data.shape
+    dtype = np.result_type(data.dtype, np.float32)
+    rng = np.random.default_rng(seed)
+    barycentres = np.array(data[np.sort(rng.choice(n, size=k, replace=False))], dtype=np.float64)
+    labels = np.full(n, -1, dtype=np.int32)
+
+    for _ in range(max_iter):
+        sums = np.zeros((k, dim))
+        counts = np.zeros(k, dtype=np.int64)
+        # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, and |x|^2 does not change the argmin;
+        # the expansion cancels badly away from the origin, hence the shift
+        reference = barycentres.mean(axis=0)
+        shift = reference.astype(dtype)
+        centres = (barycentres - reference).astype(dtype)
+        centre_norms = np.einsum("ij,ij->i", centres, centres)
+        changed = 0
+        for start in range(0, n, chunk_size):
+            chunk = data[start:start + chunk_size]
+            shifted = np.subtract(chunk, shift, dtype=dtype)
+            nearest = (centre_norms - 2 * (shifted @ centres.T)).argmin(axis=1)
+            changed += np.count_nonzero(nearest != labels[start:start + len(chunk)])
+            labels[start:start + len(chunk)] = nearest
+            counts += np.bincount(nearest, minlength=k)
+            one_hot = np.zeros((len(chunk), k))
+            one_hot[np.arange(len(chunk)), nearest] = 1
+            sums += one_hot.T @ chunk.astype(np.float64)
+
+        filled = counts > 0
+        barycentres[filled] = sums[filled] / counts[filled, None]
+        if not changed:
+            break
+    return labels, barycentres
+
+
+def mean_squared_distance_array(data, labels, barycentres, chunk_size=65536):
+    """Mean squared distance from points to their barycenter, for kmeans_array results."""
+    total = 0.0
+    for start in range(0, len(data), chunk_size):
+        chunk = np.asarray(data[start:start + chunk_size], dtype=np.float64)
+        diff = chunk - barycentres[labels[start:start + len(chunk)]]
+        total += np.einsum("ij,ij->", diff, diff)
+    return total / len(data) if len(data) else 0
+
+
+def sample_clusters(clusters, max_points, seed=None):
+    """
+    Return a copy of the clusters (as arrays) holding at most max_points points
+    in total, each cluster keeping a share proportional to its size (at least one point).
+    """
+    clusters = [np.asarray(c, dtype=float) for c in clusters]
+    total = sum(len(c) for c in clusters)
+    if total <= max_points:
+        return clusters
+    rng = np.random.default_rng(seed)
+    sampled = []
+    for c in clusters:
+        m = min(len(c), max(1, round(max_points * len(c) / total)))
+        sampled.append(c[rng.choice(len(c), size=m, replace=False)] if len(c) else c)
+    return sampled
+
+
+def _plot_density(ax, clusters, colors, bins):
+    """Draw the clusters as density histograms instead of individual points."""
+    points = [c for c in clusters if len(c)]
+    low = np.min([c.min(axis=0) for c in points], axis=0)
+    high = np.max([c.max(axis=0) for c in points], axis=0)
+    edges = [np.linspace(lo, hi if hi > lo else lo + 1, bins + 1) for lo, hi in zip(low, high)]
+    counts = np.array([np.histogramdd(c.reshape(-1, len(edges)), bins=edges)[0]
+                       for c in clusters])
+    total = counts.sum(axis=0)
+    # each cell takes the color of its dominant cluster, the darker the denser
+    dominant = counts.argmax(axis=0)
+    strength = np.log1p(total) / np.log1p(total.max())
+
+    if len(edges) == 2:
+        image = np.ones(total.shape + (4,))
+        image[..., :3] = colors[dominant][..., :3]
+        image[..., 3] = strength
+        ax.imshow(image.transpose(1, 0, 2), origin="lower", aspect="auto",
+                  extent=(edges[0][0], edges[0][-1], edges[1][0], edges[1][-1]),
+                  interpolation="nearest")
+    else:
+        # 3D: one marker per non-empty cell, sized by its density
+        centres = [(e[:-1] + e[1:]) / 2 for e in edges]
+        cells = np.nonzero(total)
+        xyz = [centres[axis][cells[axis]] for axis in range(3)]
+        ax.scatter(*xyz, color=colors[dominant[cells]], s=20 * strength[cells],
+                   alpha=0.6, depthshade=False)
+
+
+def plot_kmeans_result(clusters, barycentres, mode="scatter", max_points=None, bins=None,
+                       filename=None, seed=None):
+    """
+    Display a 2D or 3D plot of clusters and barycenters.
+    mode="scatter": one marker per point, or per sampled point if max_points is
+    given (stratified by cluster); mode="density": per-cell histograms of the
+    clusters, with bins cells per axis (default 200 in 2D, 30 in 3D).
+    Barycenters are always drawn exactly. With a filename, the figure is saved
+    as an image instead of being shown (no display needed).
+    """
+    dim = len(barycentres[0])
     fig = plt.figure()
-    ax = plt.axes(projection='3d')
+    ax = plt.axes(projection='3d') if dim == 3 else plt.axes()
     colors = plt.cm.tab10(np.linspace(0, 1, len(clusters)))
 
-    for i, cluster in enumerate(clusters):
-        x = [p[0] for p in cluster]
-        y = [p[1] for p in cluster]
-        z = [p[2] for p in cluster]
-        ax.scatter(x, y, z, color=colors[i])
-
-    bx = [b[0] for b in barycentres]
-    by = [b[1] for b in barycentres]
-    bz = [b[2] for b in barycentres]
-    ax.scatter(bx, by, bz, color='black', marker='D', s=100)
+    if mode == "density":
+        clusters = [np.asarray(c, dtype=float).reshape(-1, dim) for c in clusters]
+        _plot_density(ax, clusters, colors, bins or (30 if dim == 3 else 200))
+    else:
+        style = {}
+        if max_points is not None:
+            clusters = sample_clusters(clusters, max_points, seed)
+            style = {"s": 4}
+        for i, cluster in enumerate(clusters):
+            cluster = np.asarray(cluster, dtype=float).reshape(-1, dim)
+            ax.scatter(*cluster.T, color=colors[i], **style)
+
+    b = np.asarray(barycentres, dtype=float)
+    ax.scatter(*b.T, color='black', marker='D', s=100)
     ax.set_title('K-means Clustering Result')
-    plt.show()
+    if filename is not None:
+        fig.savefig(filename, dpi=150)
+        plt.close(fig)
+    else:
+        plt.show()
 
 
 def mean_squared_distance(clusters, barycentres):
@@ -100,6 +227,14 @@ clusters, barycentres = kmeans(data, 2)
 plot_kmeans_result(clusters, barycentres)
 
 
+# Same clustering on a float32 array (a np.memmap of a large file works the same way)
+
+points = np.array(data, dtype=np.float32)
+point_labels, centres = kmeans_array(points, 2)
+print(f"Mean squared distance (float32 array): "
+      f"{mean_squared_distance_array(points, point_labels, centres):.2f}")
+
+
 # Optional: analyze evolution of mean squared distance
 
 analyze_k_values(data, 2, 10)
@@ -134,8 +269,12 @@ color_map = {
     "apple": "green",
 }
 
-for pt, lab in zip(data, labels):
-    plt.scatter(pt[0], pt[1], color=color_map.get(lab, "gray"))
+# one scatter call per class rather than per point
+points = np.array(data)
+classes = np.array(labels)
+for lab in sorted(set(labels)):
+    selected = points[classes == lab]
+    plt.scatter(selected[:, 0], selected[:, 1], color=color_map.get(lab, "gray"))
 
 plt.title("Fruits (true labels)")
 plt.xlabel(f"{header[0]}")
@@ -148,6 +287,17 @@ plt.show()
 clusters, centers = kmeans(data, 2)
 
 
+# Measure the quality of the clustering (see cluster_metrics.py)
+
+# clusters hold the very point objects of data: recover the cluster of each point
+cluster_of = {id(p): i for i, cluster in enumerate(clusters) for p in cluster}
+predicted = [cluster_of[id(p)] for p in data]
+
+print(f"Silhouette: {silhouette_score(data, predicted):.3f}")
+print(f"Davies-Bouldin: {davies_bouldin(data, predicted):.3f}")
+print(f"Adjusted Rand index with true labels: {adjusted_rand_index(labels, predicted):.3f}")
+
+
 # Visualize clusters found by k-means
 
 colors = plt.cm.tab10(np.linspace(0, 1, len(clusters)))
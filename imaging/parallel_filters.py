@@ -0,0 +1,113 @@
+"""
+Tutorial: Multi-threaded blur and convolution for large images
+
+Same results as blur_image (rgb_image_processing.py) and filter_image
+(sobel_edge_detection.py), computed with NumPy on several cores:
+- the image is copied once into a zero-padded array (of the same 8-bit
+  values), so every band of rows can read the rows around it (its halo)
+  without special cases at the borders; only the band being computed is
+  held in 32-bit sums;
+- the rows are split into bands, each band being computed by a thread of a
+  pool; NumPy releases the GIL during array operations, so the threads
+  really run in parallel;
+- every band writes its own rows of a single output array allocated beforehand.
+
+blur_array and filter_array work on NumPy arrays; blur_image_parallel and
+filter_image_parallel take and return the list formats of the tutorials,
+which call them when given a number of workers.
+
+Usage:
+    from parallel_filters import blur_image_parallel
+    blurred = blur_image_parallel(img, 10, workers=8)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def _bands(height, workers):
+    """Split rows 0..height into about 4 bands per worker."""
+    count = max(1, min(height, 4 * workers))
+    bounds = np.linspace(0, height, count + 1).astype(int)
+    return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def _run_bands(height, workers, compute_band):
+    """Call compute_band(start, stop) for every band of rows, in a thread pool."""
+    workers = workers or os.cpu_count() or 1
+    bands = _bands(height, workers)
+    if workers == 1:
+        for start, stop in bands:
+            compute_band(start, stop)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # list() re-raises the exception of a failed band, if any
+        list(pool.map(lambda band: compute_band(*band), bands))
+
+
+def blur_array(img, d, workers=None):
+    """
+    Blur an (height, width, 3) array of 0-255 values with radius d: each pixel
+    becomes the mean of the pixels at distance <= d inside the image (rounded down).
+    """
+    height, width = img.shape[:2]
+    padded = np.zeros((height + 2 * d, width + 2 * d, 3), dtype=np.uint8)
+    padded[d:d + height, d:d + width] = img
+    offsets = [(di, dj) for di in range(-d, d + 1) for dj in range(-d, d + 1)
+               if di * di + dj * dj <= d * d]
+    # an offset (di, dj) counts for pixel (i, j) when row i + di and column
+    # j + dj are both inside the image: with column_counts[di + d, j] the
+    # number of offsets of row di valid at column j, the counts of a band are
+    # the product of its row validity by this table
+    column_counts = np.zeros((2 * d + 1, width), dtype=np.int32)
+    for di, dj in offsets:
+        column_counts[di + d, max(0, -dj):min(width, width - dj)] += 1
+    result = np.empty((height, width, 3), dtype=np.uint8)
+
+    def compute_band(start, stop):
+        sums = np.zeros((stop - start, width, 3), dtype=np.int32)
+        for di, dj in offsets:
+            sums += padded[start + d + di:stop + d + di, d + dj:d + dj + width]
+        rows = np.arange(start, stop) + np.arange(-d, d + 1)[:, None]
+        row_valid = ((rows >= 0) & (rows < height)).astype(np.int32)
+        counts = row_valid.T @ column_counts
+        result[start:stop] = sums // counts[..., None]
+
+    _run_bands(height, workers, compute_band)
+    return result
+
+
+def filter_array(pixels, grad, workers=None):
+    """Apply a 3x3 mask to a (height, width) array (zeros outside), clamping to 0-255."""
+    height, width = pixels.shape
+    padded = np.zeros((height + 2, width + 2), dtype=np.int32)
+    padded[1:1 + height, 1:1 + width] = pixels
+    result = np.empty((height, width), dtype=np.uint8)
+
+    def compute_band(start, stop):
+        acc = np.zeros((stop - start, width), dtype=np.int32)
+        idx = 0
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                if grad[idx]:
+                    acc += grad[idx] * padded[start + 1 + di:stop + 1 + di, 1 + dj:1 + dj + width]
+                idx += 1
+        np.clip(acc, 0, 255, out=acc)
+        result[start:stop] = acc
+
+    _run_bands(height, workers, compute_band)
+    return result
+
+
+def blur_image_parallel(img, d, workers=None):
+    """blur_image for a list of rows of (r, g, b) tuples, computed in parallel."""
+    blurred = blur_array(np.array(img, dtype=np.uint8), d, workers)
+    return [[tuple(pixel) for pixel in row] for row in blurred.tolist()]
+
+
+def filter_image_parallel(height, width, pixels, grad, workers=None):
+    """filter_image for a flat list of pixels, computed in parallel."""
+    array = np.array(pixels, dtype=np.int32).reshape(height, width)
+    return filter_array(array, grad, workers).ravel().tolist()
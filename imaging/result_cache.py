@@ -0,0 +1,135 @@
+"""
+Tutorial: Content-addressed cache of intermediate image results
+
+Stores the results of expensive image operations (gradients, blur, ...) on
+disk, so that running a pipeline again with only its last parameters changed
+reuses everything computed before:
+- a result is identified by a hash of (input content hash, operation,
+  parameters); the key of a result can itself be the input of the next step;
+- results are stored as compact binary files (one byte per channel value);
+- the total size of the cache is bounded, the least recently used results
+  being deleted first (reading a result refreshes its modification time).
+
+Usage:
+    cache = ResultCache()
+    key = cache.key(file_digest("image.pgm"), "filter_image", GRAD_H)
+    src1 = cached_call(cache, key, lambda: filter_image(...), encode_gray, decode_gray)
+"""
+
+import hashlib
+import os
+import struct
+import time
+from array import array
+
+
+CACHE_DIR = ".image_cache"
+MAX_BYTES = 512 * 1024 * 1024
+
+RGB_HEADER = struct.Struct("<II")   # height, width
+
+
+def file_digest(filename):
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def encode_gray(pixels):
+    """Encode a flat list of gray levels (0-255)."""
+    return array("B", pixels).tobytes()
+
+
+def decode_gray(data):
+    return array("B", data).tolist()
+
+
+def encode_rgb(img):
+    """Encode an image given as a list of rows of (r, g, b) tuples."""
+    height = len(img)
+    width = len(img[0]) if height else 0
+    values = array("B", (v for row in img for pixel in row for v in pixel))
+    return RGB_HEADER.pack(height, width) + values.tobytes()
+
+
+def decode_rgb(data):
+    height, width = RGB_HEADER.unpack_from(data)
+    values = data[RGB_HEADER.size:]
+    img = []
+    k = 0
+    for _ in range(height):
+        img.append([tuple(values[k + 3 * j:k + 3 * j + 3]) for j in range(width)])
+        k += 3 * width
+    return img
+
+
+class ResultCache:
+    """Directory of results, bounded in size, evicting the least recently used."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        """Return the key of a result from its input key(s), operation and parameters."""
+        return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".bin")
+
+    def get(self, key):
+        """Return the stored bytes of a result, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        os.utime(path, (now, now))
+        return data
+
+    def put(self, key, data):
+        """Store the bytes of a result, then evict old results if needed."""
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used results until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bin"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def cached_call(cache, key, compute, encode, decode):
+    """Return decode(cached bytes) for a key, or compute, store and return the result."""
+    if cache is None:
+        return compute()
+    data = cache.get(key)
+    if data is not None:
+        return decode(data)
+    result = compute()
+    cache.put(key, encode(result))
+    return result
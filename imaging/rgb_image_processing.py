@@ -3,10 +3,18 @@ Tutorial: RGB image creation and manipulation (PPM format)
 Image representation:
 - A list of H rows, each row is a list of L pixels.
 - Each pixel is a triplet (r, g, b) with values between 0 and 255.
+
+Usage:
+    python rgb_image_processing.py [workers]
+With a number of workers, the blur is computed on that many threads by
+parallel_filters.py (needs NumPy), with the same result.
 """
 
+import sys
 from math import sqrt
 
+from result_cache import ResultCache, cached_call, decode_rgb, encode_rgb, file_digest
+
 
 def create_image(height, width, color):
     """Return an image (list of lists) filled with the same RGB color."""
@@ -111,11 +119,15 @@ def read_image(filename):
     return img
 
 
-def blur_image(img, d):
+def blur_image(img, d, workers=None):
     """
     Apply a blur of radius d.
     Each pixel becomes the mean color of neighbors within distance <= d.
+    With a number of workers, it is computed in parallel with NumPy.
     """
+    if workers:
+        from parallel_filters import blur_image_parallel
+        return blur_image_parallel(img, d, workers)
     height = len(img)
     width = len(img[0])
     new_img = create_image(height, width, (0, 0, 0))
@@ -155,6 +167,8 @@ def gray_image(img):
     return gray_img
 
 
+workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
 # Create a base blue background
 img = create_image(300, 300, (31, 119, 180))
 
@@ -165,12 +179,20 @@ add_rectangle(img, (115, 115), (185, 185), (44, 160, 44))
 # Save artwork creation
 save_image(img, "my_artwork")
 
+# Intermediate results are kept in a cache (see result_cache.py):
+# running the script again on the same image reuses them
+cache = ResultCache()
+source = file_digest("rose-ringed-parakeet.ppm")
+
 # Read ppm image
-img = read_image("rose-ringed-parakeet.ppm")
+img = cached_call(cache, ResultCache.key(source, "read_image"),
+                  lambda: read_image("rose-ringed-parakeet.ppm"), encode_rgb, decode_rgb)
 
 # Blur and gray filters
-blurred = blur_image(img, 10)
+blur_key = ResultCache.key(source, "blur_image", 10)
+blurred = cached_call(cache, blur_key, lambda: blur_image(img, 10, workers), encode_rgb, decode_rgb)
 save_image(blurred, "parakeet-blur")
 
-gray = gray_image(blurred)
+gray = cached_call(cache, ResultCache.key(blur_key, "gray_image"),
+                   lambda: gray_image(blurred), encode_rgb, decode_rgb)
 save_image(gray, "parakeet-blur-gray")
\ No newline at end of file
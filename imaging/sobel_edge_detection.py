@@ -5,10 +5,18 @@ Keeps 3 variables at each step:
 - height
 - pixels (flattened list, row major)
 Works for ASCII PGM (P2).
+
+Usage:
+    python sobel_edge_detection.py [workers]
+With a number of workers, the gradients are computed on that many threads by
+parallel_filters.py (needs NumPy), with the same result.
 """
 
+import sys
 from math import sqrt
 
+from result_cache import ResultCache, cached_call, decode_gray, encode_gray, file_digest
+
 
 def file_to_list(filename):
     """Read an ASCII PGM (P2) file and return (width, height, pixels)."""
@@ -69,8 +77,14 @@ def get_pixel(pixels, width, height, i, j):
     return pixels[i * width + j]
 
 
-def filter_image(height, width, pixels, grad):
-    """Apply a 3x3 mask (grad) to the image and return a new pixel list."""
+def filter_image(height, width, pixels, grad, workers=None):
+    """
+    Apply a 3x3 mask (grad) to the image and return a new pixel list.
+    With a number of workers, it is computed in parallel with NumPy.
+    """
+    if workers:
+        from parallel_filters import filter_image_parallel
+        return filter_image_parallel(height, width, pixels, grad, workers)
     result = [0] * (width * height)
     for i in range(height):
         for j in range(width):
@@ -115,7 +129,7 @@ def threshold(pixels, t):
     return [255 if p > t else 0 for p in pixels]
 
 
-def edge_detection_pipeline(src_filename, dst_prefix="src"):
+def edge_detection_pipeline(src_filename, dst_prefix="src", t=125, cache=None, workers=None):
     """
     Full edge detection pipeline:
     1. load src
@@ -123,21 +137,31 @@ def edge_detection_pipeline(src_filename, dst_prefix="src"):
     3. apply vertical gradient -> src2
     4. combine -> src3
     5. invert -> src4
-    6. threshold at 125 -> src5
+    6. threshold at t -> src5
     All images are saved.
+    With a ResultCache, the gradients and their combination are reused from
+    earlier runs on the same image, so trying another threshold is immediate.
+    The gradients are computed on 'workers' threads if given (see filter_image).
     """
     width, height, pixels = file_to_list(src_filename)
+    source = file_digest(src_filename) if cache is not None else None
 
     # 1. horizontal
-    src1 = filter_image(height, width, pixels, GRAD_H)
+    key1 = ResultCache.key(source, "filter_image", GRAD_H)
+    src1 = cached_call(cache, key1, lambda: filter_image(height, width, pixels, GRAD_H, workers),
+                       encode_gray, decode_gray)
     list_to_file(width, height, src1, f"{dst_prefix}1.pgm")
 
     # 2. vertical
-    src2 = filter_image(height, width, pixels, GRAD_V)
+    key2 = ResultCache.key(source, "filter_image", GRAD_V)
+    src2 = cached_call(cache, key2, lambda: filter_image(height, width, pixels, GRAD_V, workers),
+                       encode_gray, decode_gray)
     list_to_file(width, height, src2, f"{dst_prefix}2.pgm")
 
     # 3. combine
-    src3 = edge_magnitude(width, height, src1, src2)
+    key3 = ResultCache.key(key1, key2, "edge_magnitude")
+    src3 = cached_call(cache, key3, lambda: edge_magnitude(width, height, src1, src2),
+                       encode_gray, decode_gray)
     list_to_file(width, height, src3, f"{dst_prefix}3.pgm")
 
     # 4. invert
@@ -145,13 +169,20 @@ def edge_detection_pipeline(src_filename, dst_prefix="src"):
     list_to_file(width, height, src4, f"{dst_prefix}4.pgm")
 
     # 5. threshold
-    src5 = threshold(src4, 125)
+    src5 = threshold(src4, t)
     list_to_file(width, height, src5, f"{dst_prefix}5.pgm")
 
 
+workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
 # copy test 
 w, h, pix = file_to_list("rose-ringed-parakeet.pgm")
 list_to_file(w, h, pix, "rose-ringed-parakeet_copy.pgm")
 
 # full edge detection pipeline
-edge_detection_pipeline("rose-ringed-parakeet.pgm")
\ No newline at end of file
+cache = ResultCache()
+edge_detection_pipeline("rose-ringed-parakeet.pgm", cache=cache, workers=workers)
+
+# another threshold: the gradients come from the cache
+edge_detection_pipeline("rose-ringed-parakeet.pgm", dst_prefix="src_t100_", t=100, cache=cache,
+                        workers=workers)
\ No newline at end of file
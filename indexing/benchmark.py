@@ -0,0 +1,178 @@
+"""
+Tutorial: Reproducible benchmark of the indexers
+
+Generates a synthetic corpus (random words whose frequencies follow Zipf's
+law, as in real text), builds the word trie and the search engine on it, and
+runs a fixed set of queries of each kind. The same arguments always generate
+the same corpus and queries, so that two versions of the code can be compared.
+
+Prints, for each build, the time spent walking, reading, tokenizing and
+inserting, the counts and rates (files/s, bytes/s, tokens/s, trie nodes,
+postings), and the memory the index takes (measured with tracemalloc during a
+second build, so that tracing does not slow down the timed one); then the
+latency percentiles of each kind of query.
+
+Usage:
+    python benchmark.py [files] [words_per_file] [queries] [seed] [profile_file]
+With a profile_file, the trie is built once more under cProfile and the
+statistics are saved to that file (read it with 'python -m pstats profile_file').
+"""
+
+import os
+import random
+import sys
+import tempfile
+
+from instrumentation import BuildStats, LatencyHistogram, add_file_timed, profile_to, traced_memory
+from search_engine import SearchEngine
+from tokenizer import tokenize_file
+from trie import Trie
+from trie_queries import prefix_search, wildcard_search, fuzzy_search
+
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_vocabulary(size, rng):
+    """Return 'size' distinct random words of 2 to 12 letters."""
+    words = set()
+    while len(words) < size:
+        length = min(12, max(2, int(rng.gauss(6, 2))))
+        words.add("".join(rng.choice(LETTERS) for _ in range(length)))
+    return sorted(words)
+
+
+def generate_corpus(directory, files, words_per_file, seed=0, vocabulary_size=20000):
+    """
+    Write 'files' text files of 'words_per_file' words into 'directory'.
+    Return the vocabulary, most frequent word first.
+    """
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    rng.shuffle(vocabulary)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    for n in range(files):
+        words = rng.choices(vocabulary, weights, k=words_per_file)
+        # about 12 words per line, with some punctuation
+        lines = [" ".join(words[i:i + 12]) + rng.choice(".,;!?")
+                 for i in range(0, len(words), 12)]
+        subdir = os.path.join(directory, f"d{n % 10}")
+        os.makedirs(subdir, exist_ok=True)
+        with open(os.path.join(subdir, f"f{n}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    return vocabulary
+
+
+def walk(root):
+    """Return the paths of the .txt files below root, in a fixed order."""
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        paths.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                     if name.endswith(".txt"))
+    return paths
+
+
+def build_trie(root, stats):
+    with stats.phase("walk"):
+        paths = walk(root)
+    index = Trie()
+    for path in paths:
+        add_file_timed(index, path, stats)
+    stats.count("nodes", index.node_count)
+    stats.count("postings", index.posting_count)
+    with stats.phase("minimize"):
+        index.minimize()
+    stats.stop()
+    return index
+
+
+def build_engine(root, stats):
+    with stats.phase("walk"):
+        paths = walk(root)
+    engine = SearchEngine()
+    for path in paths:
+        with stats.phase("tokenize"):
+            words = list(tokenize_file(path))
+        with stats.phase("insert"):
+            engine.add_document(path, words)
+        stats.count("files")
+        stats.count("bytes", os.path.getsize(path))
+        stats.count("tokens", len(words))
+    stats.stop()
+    return engine
+
+
+def make_queries(vocabulary, count, rng):
+    """Return {kind: [query, ...]}, the words being drawn with their frequencies."""
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    words = rng.choices(vocabulary, weights, k=count)
+
+    def typo(word):
+        i = rng.randrange(len(word))
+        return word[:i] + rng.choice(LETTERS) + word[i + 1:]
+
+    def pattern(word):
+        i = rng.randrange(len(word))
+        return word[:i] + "?" + word[i + 1:-1] + "*"
+
+    return {
+        "exact": words,
+        "prefix": [word[:2] for word in words],
+        "wildcard": [pattern(word) for word in words],
+        "fuzzy": [typo(word) for word in words],
+        "bm25": [f"{a} {b}" for a, b in zip(words, reversed(words))],
+    }
+
+
+def run_queries(index, engine, queries):
+    """Return {kind: LatencyHistogram} for the given queries."""
+    runners = {
+        "exact": index.find,
+        "prefix": lambda q: prefix_search(index, q, top_n=10),
+        "wildcard": lambda q: wildcard_search(index, q, limit=100),
+        "fuzzy": lambda q: fuzzy_search(index, q, 1, limit=100),
+        "bm25": lambda q: engine.search(q, k=10),
+    }
+    latencies = {}
+    for kind, run in runners.items():
+        histogram = latencies[kind] = LatencyHistogram()
+        for query in queries[kind]:
+            with histogram.measure():
+                run(query)
+    return latencies
+
+
+def main(files, words_per_file, queries, seed, profile_file=None):
+    with tempfile.TemporaryDirectory() as root:
+        print(f"Generating {files} files of {words_per_file} words (seed {seed})...")
+        vocabulary = generate_corpus(root, files, words_per_file, seed)
+
+        stats = BuildStats()
+        index = build_trie(root, stats)
+        stats.memory = traced_memory(lambda: build_trie(root, BuildStats()))
+        print(f"\nWord trie build\n{stats.report()}")
+        if profile_file:
+            with profile_to(profile_file):
+                build_trie(root, BuildStats())
+
+        stats = BuildStats()
+        engine = build_engine(root, stats)
+        stats.memory = traced_memory(lambda: build_engine(root, BuildStats()))
+        print(f"\nSearch engine build\n{stats.report()}")
+
+        print("\nQueries")
+        latencies = run_queries(index, engine, make_queries(vocabulary, queries, random.Random(seed)))
+        for kind, histogram in latencies.items():
+            print(f"  {kind:8} {histogram.summary()}")
+        if profile_file:
+            print(f"\nProfile of the trie build saved to {profile_file}")
+
+
+if __name__ == "__main__":
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    words_per_file = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    queries = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    profile_file = sys.argv[5] if len(sys.argv) > 5 else None
+    main(files, words_per_file, queries, seed, profile_file)
@@ -0,0 +1,218 @@
+"""
+Tutorial: File catalogue in a SQLite database
+
+Keeps the list of files of a directory tree in a local SQLite database, with
+their extension, size and modification time:
+- the tree is walked with os.scandir, reusing the information of each DirEntry;
+- rows are inserted in batches, inside one transaction, in WAL mode;
+- the mtime of every directory is stored, and a refresh only lists again the
+  directories whose mtime changed (files added, removed or renamed in them);
+- editing a file does not change its directory's mtime, so the files already
+  catalogued in an unchanged directory are stat'ed again (much cheaper than
+  listing it) and their rows updated when their size or mtime changed.
+
+Queries such as "all .py files modified in the last day larger than 1 MB"
+use the indexes on extension, size and mtime.
+
+Usage:
+    python file_catalogue.py directory [database] [extension]
+"""
+
+import os
+import sqlite3
+import sys
+import time
+
+
+BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime INTEGER
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE INDEX IF NOT EXISTS files_ext ON files(ext);
+CREATE INDEX IF NOT EXISTS files_size ON files(size);
+CREATE INDEX IF NOT EXISTS files_mtime ON files(mtime);
+"""
+
+
+def extension(name):
+    """Return the extension of a file name ('.py'), or 'no suffix'."""
+    parts = name.split(".")
+    if len(parts) == 1:
+        return "no suffix"
+    return "." + parts[-1]
+
+
+def open_catalogue(filename):
+    """Open (and create if needed) a catalogue database."""
+    conn = sqlite3.connect(filename)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA case_sensitive_like=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _below(path):
+    """Return a LIKE pattern (escaped with '\\') matching the paths inside a directory."""
+    escaped = path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + os.sep + "%"
+
+
+def _forget_dir(conn, path):
+    """Remove a directory, its subdirectories and their files from the catalogue."""
+    pattern = _below(path)
+    conn.execute("DELETE FROM files WHERE dir = ? OR dir LIKE ? ESCAPE '\\'", (path, pattern))
+    conn.execute("DELETE FROM dirs WHERE path = ? OR path LIKE ? ESCAPE '\\'", (path, pattern))
+
+
+def refresh(conn, root):
+    """
+    Bring the catalogue of 'root' up to date, listing only the directories
+    that changed. Return the number of directories listed again.
+    """
+    def restat(path):
+        """Update the rows of the files of an unchanged directory that were edited."""
+        known = conn.execute("SELECT path, size, mtime FROM files WHERE dir = ?", (path,))
+        updates = []
+        gone = []
+        for file_path, size, file_mtime in known.fetchall():
+            try:
+                st = os.stat(file_path, follow_symlinks=False)
+            except OSError:
+                gone.append((file_path,))
+                continue
+            if st.st_size != size or st.st_mtime != file_mtime:
+                updates.append((st.st_size, st.st_mtime, file_path))
+        conn.executemany("UPDATE files SET size = ?, mtime = ? WHERE path = ?", updates)
+        conn.executemany("DELETE FROM files WHERE path = ?", gone)
+
+    root = os.path.abspath(root)
+    rows = []
+    listed = 0
+
+    def flush():
+        conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", rows)
+        rows.clear()
+
+    with conn:
+        stack = [(root, None)]
+        while stack:
+            path, parent = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                _forget_dir(conn, path)
+                continue
+
+            stored = conn.execute("SELECT mtime FROM dirs WHERE path = ?", (path,)).fetchone()
+            if stored is not None and stored[0] == mtime:
+                # unchanged listing: its files may have been edited, and its
+                # subdirectories need a look
+                restat(path)
+                subdirs = conn.execute("SELECT path FROM dirs WHERE parent = ?", (path,))
+                stack.extend((sub, path) for (sub,) in subdirs.fetchall())
+                continue
+
+            listed += 1
+            try:
+                entries = list(os.scandir(path))
+            except OSError:
+                _forget_dir(conn, path)
+                continue
+
+            conn.execute("DELETE FROM files WHERE dir = ?", (path,))
+            subdirs = set()
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.add(entry.path)
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                rows.append((entry.path, path, extension(entry.name), st.st_size, st.st_mtime))
+                if len(rows) >= BATCH_SIZE:
+                    flush()
+
+            known = conn.execute("SELECT path FROM dirs WHERE parent = ?", (path,)).fetchall()
+            for (old,) in known:
+                if old not in subdirs:
+                    _forget_dir(conn, old)
+
+            conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)", (path, parent, mtime))
+            stack.extend((sub, path) for sub in subdirs)
+        flush()
+    return listed
+
+
+def find_files(conn, ext=None, min_size=None, max_size=None, modified_since=None, root=None):
+    """Return the paths matching all the given criteria (sizes in bytes, time as timestamp)."""
+    clauses = []
+    params = []
+    if ext is not None:
+        clauses.append("ext = ?")
+        params.append(ext)
+    if min_size is not None:
+        clauses.append("size >= ?")
+        params.append(min_size)
+    if max_size is not None:
+        clauses.append("size <= ?")
+        params.append(max_size)
+    if modified_since is not None:
+        clauses.append("mtime >= ?")
+        params.append(modified_since)
+    if root is not None:
+        root = os.path.abspath(root)
+        clauses.append("(dir = ? OR dir LIKE ? ESCAPE '\\')")
+        params.extend([root, _below(root)])
+
+    query = "SELECT path FROM files"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    return [path for (path,) in conn.execute(query + " ORDER BY path", params)]
+
+
+def files_by_extension(conn, root=None):
+    """Return {extension: [paths]} for the whole catalogue (or below 'root')."""
+    index = {}
+    query = "SELECT ext, path FROM files"
+    params = []
+    if root is not None:
+        root = os.path.abspath(root)
+        query += " WHERE dir = ? OR dir LIKE ? ESCAPE '\\'"
+        params = [root, _below(root)]
+    for ext, path in conn.execute(query + " ORDER BY path", params):
+        index.setdefault(ext, []).append(path)
+    return index
+
+
+if __name__ == "__main__":
+    root = sys.argv[1]
+    database = sys.argv[2] if len(sys.argv) > 2 else "file_catalogue.db"
+    ext = sys.argv[3] if len(sys.argv) > 3 else ".py"
+
+    conn = open_catalogue(database)
+    start = time.perf_counter()
+    listed = refresh(conn, root)
+    print(f"Refreshed in {time.perf_counter() - start:.3f}s ({listed} directories listed).")
+
+    start = time.perf_counter()
+    found = find_files(conn, ext=ext, min_size=1 << 20, modified_since=time.time() - 86400,
+                       root=root)
+    print(f"{len(found)} {ext} file(s) over 1 MB modified in the last day "
+          f"({(time.perf_counter() - start) * 1000:.1f} ms):")
+    for path in found:
+        print(f"  - {path}")
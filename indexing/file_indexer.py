@@ -2,53 +2,23 @@
 Tutorial: File indexing and search
 
 Recursively explores a directory, indexes files by extension, and lets the user search for text in selected file types.
+
+Usage:
+    python file_indexer.py directory [catalogue_database]
 """
 
-import os
 import sys
 
-
-def explore(rep):
-    """Recursive function that explores a directory and prints its files."""
-    print("I am in " + rep)
-    items = os.listdir(rep)
-    
-    for item in items:
-        path = os.path.join(rep, item)
-        if os.path.isdir(path):
-            explore(path)
-        else:
-            print("  File:", path)
-
-
-os.system('clear')
-explore(sys.argv[1])
-
-
-def explore(rep, index):
-    """Recursive function that explores a directory and indexes files by extension."""
-    print("I am in " + rep)
-    items = os.listdir(rep)
-
-    for item in items:
-        path = os.path.join(rep, item)
-        if os.path.isdir(path):
-            explore(path, index)
-        else:
-            parts = item.split(".")
-            if len(parts) == 1:
-                ext = "no suffix"
-            else:
-                ext = "." + parts[-1]
-
-            if ext not in index:
-                index[ext] = [path]
-            else:
-                index[ext].append(path)
+from file_catalogue import files_by_extension, open_catalogue, refresh
+from grep_engine import search_files
 
 
-index = {}
-explore(sys.argv[1], index)
+# The file list is kept in a catalogue database (see file_catalogue.py):
+# only the directories that changed since the last session are listed again.
+database = sys.argv[2] if len(sys.argv) > 2 else "file_catalogue.db"
+catalogue = open_catalogue(database)
+refresh(catalogue, sys.argv[1])
+index = files_by_extension(catalogue, sys.argv[1])
 
 total = 0
 print("\n--- File index by extension ---")
@@ -72,16 +42,8 @@ while True:
 
     print(f"\nSearching for '{pattern}' in files with extensions {exts}...\n")
 
-    for ext in exts:
-        if ext not in index:
-            continue
-        for file_path in index[ext]:
-            try:
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                    for i, line in enumerate(f, start=1):
-                        if pattern in line:
-                            print(f"{file_path} (line {i}): {line.strip()}")
-            except Exception:
-                pass
+    paths = [file_path for ext in exts for file_path in index.get(ext, [])]
+    for file_path, i, line in search_files(paths, pattern):
+        print(f"{file_path} (line {i}): {line.strip()}")
 
     print("\nSearch finished.")
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+Tutorial: Fast text search in many files
+
+Searches a list of files for a string, the way 'grep -F' does:
+- each file is mapped in memory (mmap) and searched as raw bytes for the
+  UTF-8 encoded pattern, so only the lines around a hit are ever decoded;
+- files whose first bytes contain a NUL byte are considered binary and skipped;
+- files are searched by a pool of threads (overlapping disk reads) or of
+  processes (using every core), and results are returned in the order of the
+  file list, as soon as they are ready;
+- an optional max_results stops the search once enough lines were found.
+
+Usage:
+    from grep_engine import search_files
+    for path, line_number, line in search_files(paths, "pattern"):
+        print(path, line_number, line)
+"""
+
+import mmap
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+SNIFF_SIZE = 8192
+COUNT_CHUNK = 1 << 20
+
+
+def is_binary(data):
+    """Return True if the beginning of the data contains a NUL byte."""
+    return b"\0" in data[:SNIFF_SIZE]
+
+
+def count_newlines(data, start, end):
+    """Count the newlines of data[start:end], copying at most COUNT_CHUNK bytes at once."""
+    total = 0
+    for pos in range(start, end, COUNT_CHUNK):
+        total += data[pos:min(pos + COUNT_CHUNK, end)].count(b"\n")
+    return total
+
+
+def search_bytes(data, needle, ignore_case=False):
+    """Return the list of (line_number, line) of a buffer containing 'needle'."""
+    if ignore_case:
+        regex = re.compile(re.escape(needle), re.IGNORECASE)
+
+        def find(start):
+            match = regex.search(data, start)
+            return match.start() if match else -1
+    else:
+        def find(start):
+            return data.find(needle, start)
+
+    hits = []
+    line_number = 1
+    counted_up_to = 0
+    pos = find(0)
+    while pos >= 0:
+        line_start = data.rfind(b"\n", 0, pos) + 1
+        line_end = data.find(b"\n", pos)
+        if line_end < 0:
+            line_end = len(data)
+        # count newlines only between the previous hit and this one
+        line_number += count_newlines(data, counted_up_to, line_start)
+        counted_up_to = line_start
+        hits.append((line_number, data[line_start:line_end].decode("utf-8", errors="ignore")))
+        # the rest of the line is already reported
+        pos = find(line_end + 1) if line_end < len(data) else -1
+    return hits
+
+
+def search_file(path, needle, ignore_case=False):
+    """Return the matching (line_number, line) of one file, or [] if unreadable or binary."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if is_binary(data):
+                    return []
+                return search_bytes(data, needle, ignore_case)
+    except (OSError, ValueError):
+        return []
+
+
+def search_files(paths, pattern, ignore_case=False, max_results=None,
+                 workers=None, processes=False):
+    """
+    Yield (path, line_number, line) for every line containing 'pattern',
+    file by file in the order of 'paths'.
+    ignore_case only folds ASCII letters, the search being done on bytes.
+    """
+    needle = pattern.encode("utf-8")
+    if not needle:
+        return
+    if workers is None:
+        workers = os.cpu_count() or 1
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+
+    count = 0
+    window = 4 * workers
+    pending = deque()
+    paths = iter(paths)
+    with executor(max_workers=workers) as pool:
+        try:
+            while True:
+                # keep a bounded window of files in flight, consumed in order
+                for path in paths:
+                    pending.append((path, pool.submit(search_file, path, needle, ignore_case)))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    break
+                path, future = pending.popleft()
+                for line_number, line in future.result():
+                    yield path, line_number, line
+                    count += 1
+                    if max_results is not None and count >= max_results:
+                        return
+        finally:
+            for _, future in pending:
+                future.cancel()
@@ -0,0 +1,280 @@
+"""
+Tutorial: Long-running index server
+
+Builds the search index of a directory once (see search_engine.py) and
+answers queries over a small local HTTP endpoint served with asyncio:
+    GET /search?q=cat+AND+dog&k=10&page=0   -> ranked results (JSON)
+    GET /stats                              -> latency, QPS and cache metrics
+
+- recent results are kept in an LRU cache, keyed by the index generation, so
+  they are dropped as soon as the index changes;
+- a background task rescans the directory: changed files are read in a worker
+  thread, then swapped into the index one by one between two requests, so
+  readers never wait for an update and never see a half-indexed file;
+- when too many files were replaced, the whole index is rebuilt in a thread
+  and swapped in at once.
+
+Usage:
+    python index_server.py directory [port]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from urllib.parse import parse_qs, urlsplit
+
+from search_engine import SearchEngine
+from tokenizer import tokenize_file
+
+
+TEXT_EXTENSIONS = (".txt", ".py", ".md", ".csv", ".ipynb")
+
+
+class LRUCache:
+    """Dictionary keeping at most 'capacity' entries, dropping the least recently used."""
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value for 'key', or None."""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store a value, evicting the oldest entry if the cache is full."""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class Metrics:
+    """Request counters, recent latencies and queries per second."""
+
+    def __init__(self, window=10000):
+        self.requests = 0
+        self.latencies = deque(maxlen=window)   # seconds, most recent requests
+        self.timestamps = deque()               # request times of the last minute
+
+    def record(self, latency):
+        now = time.monotonic()
+        self.requests += 1
+        self.latencies.append(latency)
+        self.timestamps.append(now)
+        while self.timestamps and self.timestamps[0] < now - 60:
+            self.timestamps.popleft()
+
+    def summary(self):
+        """Return the metrics as a dictionary."""
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+        return {
+            "requests": self.requests,
+            "qps_last_minute": len(self.timestamps) / 60,
+            "latency_ms": {"p50": percentile(50), "p95": percentile(95), "p99": percentile(99)},
+        }
+
+
+def scan(root):
+    """Return {path: mtime} for every text file below 'root'."""
+    found = {}
+    stack = [root]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.name.endswith(TEXT_EXTENSIONS):
+                try:
+                    found[entry.path] = entry.stat().st_mtime_ns
+                except OSError:
+                    pass
+    return found
+
+
+def read_documents(paths):
+    """Read and tokenize files, returning a list of (path, words)."""
+    documents = []
+    for path in paths:
+        try:
+            documents.append((path, list(tokenize_file(path))))
+        except (UnicodeDecodeError, OSError):
+            continue
+    return documents
+
+
+def build_engine(paths):
+    """Build a new search engine from a list of files."""
+    engine = SearchEngine()
+    for path, words in read_documents(paths):
+        engine.add_document(path, words)
+    return engine
+
+
+class IndexServer:
+    """Serve queries over one index, refreshed in the background."""
+
+    def __init__(self, root, cache_size=1024, refresh_interval=5.0):
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self.mtimes = scan(root)
+        self.engine = build_engine(sorted(self.mtimes))
+        self.generation = 0
+        self.cache = LRUCache(cache_size)
+        self.metrics = Metrics()
+
+    def search(self, query, k=10, page=0):
+        """Return a page of results, from the cache when possible."""
+        key = (self.generation, query, k, page)
+        results = self.cache.get(key)
+        if results is None:
+            results = [{"score": score, "file": path}
+                       for score, path in self.engine.search(query, k, page)]
+            self.cache.put(key, results)
+        return results
+
+    def stats(self):
+        summary = self.metrics.summary()
+        summary.update({
+            "generation": self.generation,
+            "files": self.engine.document_count(),
+            "terms": len(self.engine.terms),
+            "cache": {"entries": len(self.cache.entries),
+                      "hits": self.cache.hits, "misses": self.cache.misses},
+        })
+        return summary
+
+    def new_generation(self):
+        self.generation += 1
+        self.cache.clear()
+
+    async def refresh(self):
+        """Bring the index up to date with the files on disk."""
+        current = await asyncio.to_thread(scan, self.root)
+        changed = [p for p, mtime in current.items() if self.mtimes.get(p) != mtime]
+        removed = [p for p in self.mtimes if p not in current]
+        if not changed and not removed:
+            return
+
+        engine = self.engine
+        replaced = len(engine.deleted) + len(removed) + len(changed)
+        if replaced > engine.document_count() // 4:
+            # many stale postings: rebuild from scratch, readers keep the old index
+            self.engine = await asyncio.to_thread(build_engine, sorted(current))
+        else:
+            documents = await asyncio.to_thread(read_documents, changed)
+            readable = {path for path, _ in documents}
+            for path in removed + [p for p in changed if p not in readable]:
+                engine.remove_document(path)
+            for path, words in documents:
+                engine.remove_document(path)
+                engine.add_document(path, words)
+                # let pending queries run between two files
+                await asyncio.sleep(0)
+        self.mtimes = current
+        self.new_generation()
+
+    async def refresh_forever(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as error:
+                print(f"Refresh failed: {error}")
+
+    def route(self, path, params):
+        """Return (status, body) for a request."""
+        if path == "/search":
+            query = params.get("q", [""])[0]
+            try:
+                k = int(params.get("k", ["10"])[0])
+                page = int(params.get("page", ["0"])[0])
+            except ValueError:
+                return 400, {"error": "k and page must be integers"}
+            return 200, {"query": query, "generation": self.generation,
+                         "results": self.search(query, k, page)}
+        if path == "/stats":
+            return 200, self.stats()
+        return 404, {"error": f"unknown path {path}"}
+
+    async def handle(self, reader, writer):
+        """Answer the HTTP requests of one connection (keep-alive)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                keep_alive = True
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    if header.lower().startswith(b"connection:") and b"close" in header.lower():
+                        keep_alive = False
+
+                start = time.perf_counter()
+                parts = request_line.decode("latin-1").split()
+                if len(parts) < 2 or parts[0] != "GET":
+                    status, body = 405, {"error": "only GET is supported"}
+                else:
+                    url = urlsplit(parts[1])
+                    status, body = self.route(url.path, parse_qs(url.query))
+
+                payload = json.dumps(body).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload
+                )
+                await writer.drain()
+                self.metrics.record(time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.handle, host, port)
+        refresher = asyncio.create_task(self.refresh_forever())
+        print(f"Serving {self.engine.document_count()} file(s) on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            refresher.cancel()
+
+
+if __name__ == "__main__":
+    root = sys.argv[1]
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    print(f"Indexing {root}...")
+    server = IndexServer(root)
+    try:
+        asyncio.run(server.serve(port=port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,204 @@
+"""
+Tutorial: Measuring the indexers
+
+Small tools to see where the time and memory of an index build go:
+- BuildStats: time spent per phase (walk, read, tokenize, insert, ...) and
+  counters (files, bytes, tokens, trie nodes, postings), with rates per second;
+- traced_memory: memory taken by a build, measured with tracemalloc; tracing
+  slows down allocations a lot, so it is meant for a separate build, not for
+  the one being timed;
+- add_file_timed: adds the words of a file to a trie like Trie.add_file_words,
+  timing reading, tokenizing and insertion apart (TimedReader and
+  TimedIterator wrap the file and the word generator to do so);
+- LatencyHistogram: query latencies in power-of-two buckets, with percentiles;
+- profile_to: run a block under cProfile and dump the statistics to a file
+  (open it with 'python -m pstats file').
+
+Usage:
+    stats = BuildStats()
+    with stats.phase("walk"):
+        explore(root, file_list)
+    print(stats.report())
+"""
+
+import cProfile
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from tokenizer import iter_tokens
+
+
+class BuildStats:
+    """Per-phase timers and counters of an index build."""
+
+    def __init__(self, trace_memory=False):
+        self.times = {}
+        self.counters = {}
+        self.trace_memory = trace_memory
+        self.memory = None          # (allocated bytes, peak bytes), if measured
+        self.started = time.perf_counter()
+        self.elapsed = None
+        if trace_memory:
+            tracemalloc.start()
+            self._memory_start = tracemalloc.get_traced_memory()[0]
+
+    def add_time(self, phase, seconds):
+        self.times[phase] = self.times.get(phase, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block of code as part of a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def stop(self):
+        """Stop the total timer and the memory tracing."""
+        self.elapsed = time.perf_counter() - self.started
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.memory = (current - self._memory_start, peak - self._memory_start)
+
+    def report(self):
+        """Return a printable summary of the build."""
+        if self.elapsed is None:
+            self.stop()
+        lines = [f"Total: {self.elapsed:.3f}s"]
+        for name, seconds in sorted(self.times.items(), key=lambda item: -item[1]):
+            share = seconds / self.elapsed * 100 if self.elapsed else 0
+            lines.append(f"  {name:10} {seconds:8.3f}s ({share:4.1f}%)")
+        for name, value in sorted(self.counters.items()):
+            rate = value / self.elapsed if self.elapsed else 0
+            lines.append(f"  {name:10} {value:12,} ({rate:,.0f}/s)")
+        if self.memory is not None:
+            allocated, peak = self.memory
+            lines.append(f"  memory     {allocated / 2**20:8.1f} MiB kept, {peak / 2**20:.1f} MiB peak")
+        return "\n".join(lines)
+
+
+class TimedIterator:
+    """Iterator wrapper counting its items and the time spent producing them."""
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.seconds = 0.0
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            item = next(self.iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.count += 1
+        return item
+
+
+class TimedReader:
+    """File wrapper counting the time spent in read()."""
+
+    def __init__(self, f):
+        self.f = f
+        self.seconds = 0.0
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self.f.read(size)
+        self.seconds += time.perf_counter() - start
+        return data
+
+
+def traced_memory(build):
+    """Call build() under tracemalloc; return (bytes still held by its result, peak bytes)."""
+    stats = BuildStats(trace_memory=True)
+    result = build()
+    stats.stop()
+    del result
+    return stats.memory
+
+
+def add_file_timed(index, filename, stats, encoding="utf-8"):
+    """
+    Same as index.add_file_words(tokenize_file(filename), filename), with the
+    time spent reading, tokenizing and inserting into the trie added apart to
+    'stats', along with the numbers of files, bytes and tokens.
+    """
+    start = time.perf_counter()
+    with open(filename, "r", encoding=encoding) as f:
+        size = os.fstat(f.fileno()).st_size
+        reader = TimedReader(f)
+        tokens = TimedIterator(iter_tokens(reader))
+        index.add_file_words(tokens, filename)
+    total = time.perf_counter() - start
+    stats.add_time("read", reader.seconds)
+    stats.add_time("tokenize", tokens.seconds - reader.seconds)
+    stats.add_time("insert", total - tokens.seconds)
+    stats.count("files")
+    stats.count("bytes", size)
+    stats.count("tokens", tokens.count)
+
+
+class LatencyHistogram:
+    """Latencies counted in power-of-two buckets of microseconds."""
+
+    def __init__(self):
+        self.buckets = [0] * 40
+        self.total = 0
+        self.sum = 0.0
+
+    def record(self, seconds):
+        micros = int(seconds * 1e6)
+        self.buckets[min(micros.bit_length(), len(self.buckets) - 1)] += 1
+        self.total += 1
+        self.sum += seconds
+
+    @contextmanager
+    def measure(self):
+        """Record the duration of a block of code."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(time.perf_counter() - start)
+
+    def percentile(self, p):
+        """Return an upper bound of the p-th percentile, in seconds."""
+        rank = p / 100 * self.total
+        seen = 0
+        for b, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return (1 << b) / 1e6
+        return 0.0
+
+    def summary(self):
+        if not self.total:
+            return "no queries"
+        mean = self.sum / self.total * 1000
+        return (f"{self.total} queries, mean {mean:.3f} ms, "
+                f"p50 <= {self.percentile(50) * 1000:.3f} ms, "
+                f"p95 <= {self.percentile(95) * 1000:.3f} ms, "
+                f"p99 <= {self.percentile(99) * 1000:.3f} ms")
+
+
+@contextmanager
+def profile_to(filename):
+    """Profile a block of code with cProfile and save the statistics to 'filename'."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(filename)
@@ -0,0 +1,333 @@
+"""
+Tutorial: Ranked boolean search engine
+
+Builds a positional inverted index from text files:
+- every word gets an integer term ID;
+- for each term, a sorted array('I') of the file IDs containing it, and for
+  each of those files an array('I') of the word positions where it occurs.
+
+Queries combine words with AND / OR / NOT, parentheses and "quoted phrases"
+(two words side by side mean AND). Phrases are answered from the recorded
+positions, without re-reading the files. AND queries intersect posting lists
+with a galloping (exponential) search, which skips over long runs of file IDs.
+Results are ranked with BM25, using the term frequencies recorded at index
+time, and only the requested page is kept in a heap.
+
+Usage:
+    python search_engine.py file1.txt file2.txt ...
+"""
+
+import heapq
+import math
+import re
+import sys
+from array import array
+from bisect import bisect_left
+
+from tokenizer import tokenize, tokenize_file
+from trie import FileTable
+
+
+QUERY_TOKEN = re.compile(r'"[^"]*"|\(|\)|[^\s()"]+')
+
+
+def gallop(values, target, lo=0):
+    """Return the first index >= lo where values[index] >= target."""
+    step = 1
+    hi = lo
+    while hi < len(values) and values[hi] < target:
+        lo = hi + 1
+        hi += step
+        step *= 2
+    return bisect_left(values, target, lo, min(hi, len(values)))
+
+
+def intersect(lists):
+    """Intersect sorted lists, starting from the shortest one."""
+    lists = sorted(lists, key=len)
+    result = lists[0]
+    for other in lists[1:]:
+        matched = array("I")
+        pos = 0
+        for value in result:
+            pos = gallop(other, value, pos)
+            if pos == len(other):
+                break
+            if other[pos] == value:
+                matched.append(value)
+        result = matched
+        if not result:
+            break
+    return result
+
+
+def union(lists):
+    """Merge sorted lists, removing duplicates."""
+    result = array("I")
+    for value in heapq.merge(*lists):
+        if not result or result[-1] != value:
+            result.append(value)
+    return result
+
+
+def difference(values, removed):
+    """Return the values of a sorted list that are not in another sorted list."""
+    result = array("I")
+    pos = 0
+    for value in values:
+        pos = gallop(removed, value, pos)
+        if pos == len(removed) or removed[pos] != value:
+            result.append(value)
+    return result
+
+
+def parse_query(query):
+    """
+    Parse a query into a tree of tuples:
+    ("term", word), ("phrase", [words]), ("and", [...]), ("or", [...]), ("not", node).
+    Precedence: NOT, then AND (explicit or implicit), then OR.
+    """
+    tokens = QUERY_TOKEN.findall(query)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def parse_or():
+        nonlocal pos
+        children = [parse_and()]
+        while peek() == "OR":
+            pos += 1
+            children.append(parse_and())
+        children = [c for c in children if c is not None]
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else ("or", children)
+
+    def parse_and():
+        nonlocal pos
+        children = []
+        while peek() not in (None, "OR", ")"):
+            if peek() == "AND":
+                pos += 1
+                continue
+            child = parse_not()
+            if child is not None:
+                children.append(child)
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else ("and", children)
+
+    def parse_not():
+        nonlocal pos
+        if peek() == "NOT":
+            pos += 1
+            child = parse_not()
+            return None if child is None else ("not", child)
+        if peek() in (None, "OR", ")"):
+            return None
+        return parse_atom()
+
+    def parse_atom():
+        nonlocal pos
+        token = tokens[pos]
+        pos += 1
+        if token == "(":
+            node = parse_or()
+            if peek() == ")":
+                pos += 1
+            return node
+        words = tokenize(token.strip('"'))
+        if not words:
+            return None
+        if token.startswith('"') and len(words) > 1:
+            return ("phrase", words)
+        if len(words) == 1:
+            return ("term", words[0])
+        # a word such as "don't" is split like in the indexed text
+        return ("phrase", words)
+
+    tree = parse_or()
+    # unbalanced closing parentheses: keep parsing what follows them
+    while pos < len(tokens):
+        pos += 1
+        rest = parse_or()
+        if rest is not None:
+            tree = rest if tree is None else ("and", [tree, rest])
+    return tree
+
+
+class SearchEngine:
+    """Positional inverted index with boolean queries and BM25 ranking."""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.files = FileTable()
+        self.terms = {}             # word -> term ID
+        self.postings = []          # term ID -> array('I') of file IDs
+        self.positions = []         # term ID -> list of array('I'), parallel to postings
+        self.doc_lengths = array("I")
+        self.total_length = 0
+        self.deleted = set()        # IDs of removed files, still present in postings
+
+    def document_count(self):
+        """Return the number of indexed files that were not removed."""
+        return len(self.doc_lengths) - len(self.deleted)
+
+    def add_document(self, filename, words):
+        """Index an iterable of words as the content of 'filename'."""
+        doc_id = self.files.intern(filename)
+        if doc_id < len(self.doc_lengths):
+            raise ValueError(f"{filename} is already indexed")
+
+        length = 0
+        for position, word in enumerate(words):
+            term_id = self.terms.get(word)
+            if term_id is None:
+                term_id = len(self.postings)
+                self.terms[word] = term_id
+                self.postings.append(array("I"))
+                self.positions.append([])
+            docs = self.postings[term_id]
+            if not docs or docs[-1] != doc_id:
+                docs.append(doc_id)
+                self.positions[term_id].append(array("I"))
+            self.positions[term_id][-1].append(position)
+            length = position + 1
+
+        self.doc_lengths.append(length)
+        self.total_length += length
+        return doc_id
+
+    def add_file(self, filename):
+        """Read and index a text file."""
+        # read everything first, so that a decoding error leaves the index untouched
+        words = list(tokenize_file(filename))
+        return self.add_document(filename, words)
+
+    def remove_document(self, filename):
+        """
+        Hide a file from the results. Its postings stay in place until the
+        index is rebuilt, and the file can be indexed again under a new ID.
+        """
+        doc_id = self.files.ids.pop(filename, None)
+        if doc_id is None or doc_id >= len(self.doc_lengths):
+            return
+        self.deleted.add(doc_id)
+        self.total_length -= self.doc_lengths[doc_id]
+
+    def term_postings(self, word):
+        """Return the sorted file IDs containing a word."""
+        term_id = self.terms.get(word)
+        if term_id is None:
+            return array("I")
+        return self.postings[term_id]
+
+    def term_positions(self, word, doc_id):
+        """Return the positions of a word in a file (empty if absent)."""
+        term_id = self.terms.get(word)
+        if term_id is None:
+            return array("I")
+        docs = self.postings[term_id]
+        idx = bisect_left(docs, doc_id)
+        if idx == len(docs) or docs[idx] != doc_id:
+            return array("I")
+        return self.positions[term_id][idx]
+
+    def phrase_postings(self, words):
+        """Return the file IDs where the words appear consecutively."""
+        candidates = intersect([self.term_postings(w) for w in words])
+        result = array("I")
+        for doc_id in candidates:
+            lists = [self.term_positions(w, doc_id) for w in words]
+            # shift each list so that a phrase start has the same value everywhere
+            starts = intersect([array("I", (p - i for p in positions if p >= i))
+                                for i, positions in enumerate(lists)])
+            if starts:
+                result.append(doc_id)
+        return result
+
+    def evaluate(self, node):
+        """Return the sorted file IDs matching a parsed query."""
+        kind = node[0]
+        if kind == "term":
+            return self.term_postings(node[1])
+        if kind == "phrase":
+            return self.phrase_postings(node[1])
+        if kind == "or":
+            return union([self.evaluate(child) for child in node[1]])
+        if kind == "not":
+            return difference(array("I", range(len(self.doc_lengths))),
+                              self.evaluate(node[1]))
+
+        # AND: intersect the positive parts, then remove the negated ones
+        positives = [self.evaluate(c) for c in node[1] if c[0] != "not"]
+        negatives = [self.evaluate(c[1]) for c in node[1] if c[0] == "not"]
+        if positives:
+            result = intersect(positives)
+        else:
+            result = array("I", range(len(self.doc_lengths)))
+        for removed in negatives:
+            result = difference(result, removed)
+        return result
+
+    def query_words(self, node):
+        """Return the non-negated words of a parsed query, used for scoring."""
+        kind = node[0]
+        if kind == "term":
+            return [node[1]]
+        if kind == "phrase":
+            return list(node[1])
+        if kind == "not":
+            return []
+        return [w for child in node[1] for w in self.query_words(child)]
+
+    def bm25(self, doc_id, words):
+        """Return the BM25 score of a file for a list of query words."""
+        n_docs = self.document_count()
+        avg_length = self.total_length / n_docs if n_docs else 0
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / (avg_length or 1))
+        score = 0.0
+        for word in words:
+            tf = len(self.term_positions(word, doc_id))
+            if not tf:
+                continue
+            df = len(self.term_postings(word))
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            score += idf * tf * (self.k1 + 1) / (tf + norm)
+        return score
+
+    def search(self, query, k=10, page=0):
+        """Return one page of (score, filename) for a query, best first."""
+        tree = parse_query(query)
+        if tree is None:
+            return []
+        docs = self.evaluate(tree)
+        if self.deleted:
+            docs = [doc_id for doc_id in docs if doc_id not in self.deleted]
+        words = set(self.query_words(tree))
+        scored = ((self.bm25(doc_id, words), doc_id) for doc_id in docs)
+        best = heapq.nlargest(k * (page + 1), scored)
+        return [(score, self.files.path(doc_id)) for score, doc_id in best[k * page:]]
+
+
+if __name__ == "__main__":
+    engine = SearchEngine()
+    for fname in sys.argv[1:]:
+        try:
+            engine.add_file(fname)
+        except (UnicodeDecodeError, FileNotFoundError):
+            print(f"Skipped: {fname}")
+    print(f"Indexed {len(engine.doc_lengths)} file(s), {len(engine.terms)} distinct words.")
+
+    while True:
+        query = input("\nEnter a query, e.g. cat AND \"black dog\" NOT bird (or 'quit' to exit): ")
+        if query.lower() == "quit":
+            break
+
+        results = engine.search(query)
+        if not results:
+            print("No matching file.")
+        for score, fname in results:
+            print(f"{score:7.3f}  {fname}")
@@ -0,0 +1,370 @@
+"""
+Tutorial: Incremental session store for connection analytics
+
+Keeps the login sessions read from wtmp (see wtmp_reader.py) in a directory:
+- sessions are stored as three columns appended to binary files
+  (user ID, start timestamp, duration in seconds);
+- a checkpoint remembers where reading stopped in wtmp (the first record of
+  the file as a fingerprint, the offset and the time of the last record) and
+  the logins still open, so each run only reads the new records, even after
+  the file was rotated to wtmp.1 or wtmp.1.gz;
+- per-user daily and weekly rollups (count, total duration and a histogram of
+  durations in 8 log-spaced buckets per power of two, giving p50/p95 within
+  about 9%) are kept up to date in a small SQLite database, so reports over a date range read a few rollup rows instead of
+  every session, and an ingest only writes the rows it changed.
+
+Days are UTC days; weeks start on Monday.
+
+Usage:
+    python session_store.py store_directory [wtmp_file] [days]
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from math import ceil
+
+from wtmp_reader import (RECORD_SIZE, WTMP_PATH, complete_size, iter_records,
+                         pair_sessions, wtmp_files)
+
+
+DAY = 86400
+# bucket b holds the durations d with BUCKET_STARTS[b] <= d < BUCKET_STARTS[b + 1]:
+# each power of two is split into HISTOGRAM_SUBBUCKETS log-spaced buckets (a
+# bucket is about 9% wider than the previous one), the small durations have a
+# bucket each; the last start is past the largest duration stored ('I' column)
+HISTOGRAM_SUBBUCKETS = 8
+BUCKET_STARTS = [0] + sorted({ceil(2 ** (k / HISTOGRAM_SUBBUCKETS))
+                              for k in range(32 * HISTOGRAM_SUBBUCKETS + 1)})
+HISTOGRAM_BUCKETS = len(BUCKET_STARTS) - 1
+
+COLUMNS = {"user_ids": "I", "starts": "d", "durations": "I"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    login TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    period TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    histogram BLOB NOT NULL,
+    PRIMARY KEY (period, number, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def day_of(timestamp):
+    """Return the UTC day number of a timestamp."""
+    return int(timestamp // DAY)
+
+
+def week_of(day):
+    """Return the number of the week (starting on Monday) containing a day."""
+    # day 0, 1970-01-01, was a Thursday
+    return (day + 3) // 7
+
+
+def new_rollup():
+    return [0, 0, [0] * HISTOGRAM_BUCKETS]
+
+
+def add_to_rollup(rollup, duration):
+    rollup[0] += 1
+    rollup[1] += duration
+    rollup[2][bisect_right(BUCKET_STARTS, duration) - 1] += 1
+
+
+def merge_rollups(rollups):
+    """Combine several rollups into one."""
+    merged = new_rollup()
+    for count, total, histogram in rollups:
+        merged[0] += count
+        merged[1] += total
+        for b, n in enumerate(histogram):
+            merged[2][b] += n
+    return merged
+
+
+def encode_histogram(histogram):
+    # the empty buckets of the longest durations are left out
+    end = len(histogram)
+    while end and not histogram[end - 1]:
+        end -= 1
+    return array("I", histogram[:end]).tobytes()
+
+
+def decode_histogram(data):
+    histogram = array("I", data).tolist()
+    return histogram + [0] * (HISTOGRAM_BUCKETS - len(histogram))
+
+
+def percentile(rollup, p):
+    """Estimate a duration percentile from a rollup histogram (upper bucket bound)."""
+    count, _, histogram = rollup
+    if not count:
+        return 0
+    rank = p / 100 * count
+    seen = 0
+    for b, n in enumerate(histogram):
+        seen += n
+        if seen >= rank:
+            return BUCKET_STARTS[b + 1] - 1
+    return BUCKET_STARTS[-1] - 1
+
+
+def fingerprint(path):
+    """Return the first record of a wtmp file (possibly gzipped) as hex, or None if empty."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        first = f.read(RECORD_SIZE)
+    return first.hex() if len(first) == RECORD_SIZE else None
+
+
+def record_size(path):
+    """Return the size of the whole records of a wtmp file, once decompressed."""
+    if not path.endswith(".gz"):
+        return complete_size(path)
+    with gzip.open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+    return size - size % RECORD_SIZE
+
+
+def _write_json(path, value):
+    """Replace a JSON file atomically."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    os.replace(tmp, path)
+
+
+def _add_session(changes, uid, start, duration):
+    """Add a session to the daily and weekly rollups of {(period, number, user ID): rollup}."""
+    day = day_of(start)
+    add_to_rollup(changes.setdefault(("day", day, uid), new_rollup()), duration)
+    add_to_rollup(changes.setdefault(("week", week_of(day), uid), new_rollup()), duration)
+
+
+class SessionStore:
+    """
+    Sessions, checkpoint and rollups stored in one directory: state.json (the
+    checkpoint), one .bin file per session column and rollups.db.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(self._path("rollups.db"))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.users = [login for (login,) in self.db.execute("SELECT login FROM users ORDER BY id")]
+        self.user_index = {name: i for i, name in enumerate(self.users)}
+        self.saved_users = len(self.users)
+        self.checkpoint = None        # {"fingerprint", "offset", "time"} of the last wtmp read
+        self.open_sessions = {}
+        self.count = 0                # number of stored sessions
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        try:
+            with open(self._path("state.json"), encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = None
+
+        if state is not None:
+            self.checkpoint = state["checkpoint"]
+            self.open_sessions = {line: tuple(s) for line, s in state["open_sessions"].items()}
+            self.count = state["count"]
+            # stores written before the users moved to rollups.db
+            for name in state.get("users", []):
+                self.user_id(name)
+
+        # drop sessions appended by a run that stopped before saving its state
+        for name, code in COLUMNS.items():
+            path = self._path(name + ".bin")
+            size = self.count * array(code).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+        # rollups committed by such a run (or never built, or with histograms
+        # of another bucket layout: 1 is the power-of-two one of older stores)
+        # are computed again
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        if (meta.get("count", 0) != self.count
+                or meta.get("histogram_subbuckets", 1) != HISTOGRAM_SUBBUCKETS):
+            self._rebuild_rollups()
+
+    def _save(self):
+        _write_json(self._path("state.json"), {
+            "checkpoint": self.checkpoint,
+            "open_sessions": self.open_sessions,
+            "count": self.count,
+        })
+
+    def _write_rollups(self, changes):
+        """Add {(period, number, user ID): rollup} to the stored rollups, with the new users."""
+        with self.db:
+            self.db.executemany("INSERT INTO users VALUES (?, ?)",
+                                enumerate(self.users[self.saved_users:], start=self.saved_users))
+            for (period, number, uid), rollup in changes.items():
+                row = self.db.execute(
+                    "SELECT count, total, histogram FROM rollups"
+                    " WHERE period = ? AND number = ? AND user_id = ?", (period, number, uid)).fetchone()
+                if row is not None:
+                    rollup = merge_rollups([rollup, [row[0], row[1], decode_histogram(row[2])]])
+                self.db.execute("INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?)",
+                                (period, number, uid, rollup[0], rollup[1],
+                                 encode_histogram(rollup[2])))
+            self.db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                [("count", self.count),
+                                 ("histogram_subbuckets", HISTOGRAM_SUBBUCKETS)])
+        self.saved_users = len(self.users)
+
+    def _rebuild_rollups(self):
+        """Compute every rollup again from the stored sessions."""
+        changes = {}
+        for uid, start, duration in zip(*self.sessions()):
+            _add_session(changes, uid, start, duration)
+        self.db.execute("DELETE FROM rollups")
+        self._write_rollups(changes)
+
+    def user_id(self, name):
+        """Return the ID of a login, assigning a new one on first use."""
+        uid = self.user_index.get(name)
+        if uid is None:
+            uid = len(self.users)
+            self.users.append(name)
+            self.user_index[name] = uid
+        return uid
+
+    def _pending_records(self, path):
+        """Yield the wtmp records written since the checkpoint, and update it."""
+        files = wtmp_files(path)
+        if not files:
+            return
+        start = 0
+        after = None
+        if self.checkpoint is not None:
+            # the checkpointed file is found by its content, not its name or
+            # inode: it may have been renamed and compressed, and a new wtmp
+            # may reuse its inode
+            known = self.checkpoint.get("fingerprint")
+            matches = [i for i, p in enumerate(files) if known is not None and fingerprint(p) == known]
+            if matches:
+                files = files[matches[-1]:]
+                start = min(self.checkpoint["offset"], record_size(files[0]))
+            else:
+                # the file is gone (or was empty): keep only the later records
+                after = self.checkpoint.get("time")
+
+        last_time = self.checkpoint.get("time") if self.checkpoint is not None else None
+        current = files[-1]
+        end = record_size(current)
+        for p in files:
+            for record in iter_records(p, start if p == files[0] else 0,
+                                       end if p == current else None):
+                if after is not None and record.time <= after:
+                    continue
+                last_time = record.time
+                yield record
+        self.checkpoint = {"fingerprint": fingerprint(current), "offset": end, "time": last_time}
+
+    def ingest(self, path=WTMP_PATH):
+        """Store the sessions completed since the last run; return how many."""
+        columns = {name: array(code) for name, code in COLUMNS.items()}
+        changes = {}
+        records = self._pending_records(path)
+        for session in pair_sessions(records, self.open_sessions):
+            uid = self.user_id(session.user)
+            duration = max(0, int(round(session.end - session.start)))
+            columns["user_ids"].append(uid)
+            columns["starts"].append(session.start)
+            columns["durations"].append(duration)
+            _add_session(changes, uid, session.start, duration)
+
+        # sessions first, then rollups, then the checkpoint: see _load()
+        for name, values in columns.items():
+            with open(self._path(name + ".bin"), "ab") as f:
+                values.tofile(f)
+        added = len(columns["user_ids"])
+        self.count += added
+        self._write_rollups(changes)
+        self._save()
+        return added
+
+    def sessions(self):
+        """Load the raw session columns: (user_ids, starts, durations)."""
+        loaded = []
+        for name, code in COLUMNS.items():
+            values = array(code)
+            path = self._path(name + ".bin")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    values.fromfile(f, self.count)
+            loaded.append(values)
+        return tuple(loaded)
+
+    def rollups(self, since, until=None):
+        """
+        Return {login: rollup} merged from the day of 'since' up to the day
+        before 'until' (timestamps; by default, up to today included).
+        """
+        day = day_of(since)
+        stop = day_of(until) if until is not None else day_of(time.time()) + 1
+        # whole weeks inside the range are read from the weekly rollups
+        monday = day + (-(day + 3)) % 7
+        weeks = max(0, (stop - monday) // 7)
+        if weeks:
+            ranges = [("day", day, monday),
+                      ("week", week_of(monday), week_of(monday) + weeks),
+                      ("day", monday + 7 * weeks, stop)]
+        else:
+            ranges = [("day", day, stop)]
+
+        per_user = {}
+        for period, low, high in ranges:
+            rows = self.db.execute(
+                "SELECT user_id, count, total, histogram FROM rollups"
+                " WHERE period = ? AND number >= ? AND number < ?", (period, low, high))
+            for uid, count, total, histogram in rows:
+                per_user.setdefault(uid, []).append([count, total, decode_histogram(histogram)])
+        return {self.users[uid]: merge_rollups(r) for uid, r in per_user.items()}
+
+    def report(self, days=30):
+        """Return (login, count, total, p50, p95) over the last days, longest total first."""
+        rows = []
+        for login, rollup in self.rollups(time.time() - days * DAY).items():
+            rows.append((login, rollup[0], rollup[1],
+                         percentile(rollup, 50), percentile(rollup, 95)))
+        rows.sort(key=lambda row: -row[2])
+        return rows
+
+
+if __name__ == "__main__":
+    store = SessionStore(sys.argv[1])
+    path = sys.argv[2] if len(sys.argv) > 2 else WTMP_PATH
+    days = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+
+    added = store.ingest(path)
+    print(f"{added} new session(s), {store.count} stored.")
+
+    print(f"\nConnected time over the last {days} days:")
+    for login, count, total, p50, p95 in store.report(days):
+        print(f"{login:12} {count:5} sessions  {total / 3600:8.1f} h  "
+              f"p50 <= {p50 / 60:.0f} min  p95 <= {p95 / 60:.0f} min")
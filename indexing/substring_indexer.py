@@ -1,12 +1,25 @@
 """
 Tutorial: Recursive substring indexing and search
 
-Recursively explores a directory, indexes all substrings found in text files, and allows the user to search for any character sequence. Displays matching files and lines (found on demand).
+Recursively explores a directory, indexes all substrings found in text files, and allows the user to search for any character sequence. Displays matching files and lines, read directly at the line offsets recorded while indexing.
+
+Usage:
+    python script.py [--stats] directory
+With --stats, prints the time spent in each phase of the build, the size of
+the trie and the memory it takes (measured during a second build, so that
+tracing does not slow down the timed one), then the latency of the searches
+when quitting.
 """
 
 import os
 import sys
-import string
+import time
+from array import array
+from contextlib import nullcontext
+
+from instrumentation import BuildStats, LatencyHistogram, traced_memory
+from tokenizer import tokenize_lines
+from trie import Trie
 
 
 def explore(rep, file_list):
@@ -25,83 +38,140 @@ def explore(rep, file_list):
                 file_list.append(path)
 
 
-def add_word(index, word, filename):
-    """Add a string fragment into the index tree."""
-    node = index
-    for letter in word:
-        if letter not in node:
-            node[letter] = {}
-        node = node[letter]
+def add_word(index, word, filename, lines=None):
+    """Add a string fragment into the index trie, with the lines where it occurs."""
+    file_id = index.files.intern(filename)
+    index.add(word, file_id, lines)
 
-    if "files" not in node:
-        node["files"] = []
-    if filename not in node["files"]:
-        node["files"].append(filename)
 
+def build_index_from_files(file_list, stats=None):
+    """
+    Build index of all substrings from text content of files.
+    Returns the index trie and, for each file ID, the byte offsets where its
+    lines start (None if it could not be read), so that matching lines can be
+    read without rescanning files. The time of each phase is added to 'stats' if given.
+    """
+    def phase(name):
+        return nullcontext() if stats is None else stats.phase(name)
 
-def build_index_from_files(file_list):
-    """Build index of all substrings from text content of files."""
-    index = {}
+    index = Trie()
+    line_starts = []    # indexed by file ID
     for fname in file_list:
+        # every file read gets its ID, even without words, so that
+        # line_starts[file_id] is always the offsets of that file
+        file_id = index.files.intern(fname)
+        if file_id < len(line_starts):
+            continue    # already indexed
+        starts = array("Q")
+        line_starts.append(starts)
         try:
-            with open(fname, "r", encoding="utf-8") as f:
-                text = f.read().lower()
-                for ch in string.punctuation:
-                    text = text.replace(ch, " ")
-                words = text.split()
-                unique_words = set(words)
-                for word in unique_words:
-                    # add all possible substrings of the word
-                    for i in range(len(word)):
-                        for j in range(i + 1, len(word) + 1):
-                            fragment = word[i:j]
-                            add_word(index, fragment, fname)
+            with phase("tokenize"):
+                word_lines = {}
+                tokens = 0
+                for num, (offset, words) in enumerate(tokenize_lines(fname), start=1):
+                    starts.append(offset)
+                    tokens += len(words)
+                    for word in words:
+                        lines = word_lines.setdefault(word, [])
+                        if not lines or lines[-1] != num:
+                            lines.append(num)
         except (UnicodeDecodeError, FileNotFoundError):
+            line_starts[file_id] = None
             continue
-    return index
+
+        with phase("substrings"):
+            fragment_lines = {}
+            for word, lines in word_lines.items():
+                # add all possible substrings of the word
+                for i in range(len(word)):
+                    for j in range(i + 1, len(word) + 1):
+                        fragment = word[i:j]
+                        fragment_lines.setdefault(fragment, set()).update(lines)
+
+        with phase("insert"):
+            for fragment, lines in fragment_lines.items():
+                add_word(index, fragment, fname, sorted(lines))
+        if stats is not None:
+            stats.count("files")
+            stats.count("bytes", os.path.getsize(fname))
+            stats.count("tokens", tokens)
+    if stats is not None:
+        stats.count("nodes", index.node_count)
+        stats.count("postings", index.posting_count)
+    return index, line_starts
 
 
 def search_word(index, fragment):
     """Return files that contain the given substring fragment."""
-    node = index
-    for letter in fragment:
-        if letter not in node:
-            return []
-        node = node[letter]
-    return node.get("files", [])
-
-
-def search_in_files(fragment, files):
-    """Search for the fragment inside the listed files and print matches."""
-    for fname in files:
+    return index.search(fragment)
+
+
+def read_lines(fname, starts, numbers):
+    """Read the given line numbers of a file, seeking directly to each of them."""
+    lines = []
+    with open(fname, "rb") as f:
+        fd = f.fileno()
+        size = os.fstat(fd).st_size
+        for num in numbers:
+            if not 1 <= num <= len(starts):
+                continue    # the file changed since it was indexed
+            start = starts[num - 1]
+            end = starts[num] if num < len(starts) else size
+            lines.append((num, os.pread(fd, end - start, start).decode("utf-8", errors="ignore")))
+    return lines
+
+
+def search_in_files(index, line_starts, fragment):
+    """Print the lines containing the fragment, using the recorded line numbers."""
+    node = index.find(fragment)
+    if node is None or not index.posting_length(node):
+        return
+    for file_id, numbers in zip(index.postings(node), index.lines[node]):
+        fname = index.files.path(file_id)
         try:
-            with open(fname, "r", encoding="utf-8") as f:
-                for num, line in enumerate(f, start=1):
-                    if fragment in line.lower():
-                        print(f"- {fname} (line {num}): {line.strip()}")
-        except Exception:
+            for num, line in read_lines(fname, line_starts[file_id], numbers):
+                print(f"- {fname} (line {num}): {line.strip()}")
+        except OSError:
             pass
 
 
-root = sys.argv[1]
+args = [arg for arg in sys.argv[1:] if arg != "--stats"]
+stats = BuildStats() if "--stats" in sys.argv[1:] else None
+root = args[0]
 
 print(f"Exploring directory: {root}")
 file_list = []
-explore(root, file_list)
+if stats is None:
+    explore(root, file_list)
+else:
+    with stats.phase("walk"):
+        explore(root, file_list)
 print(f"Found {len(file_list)} text files.")
 print("Building substring index...")
 
-index = build_index_from_files(file_list)
+index, line_starts = build_index_from_files(file_list, stats)
 print("Index built successfully.")
+if stats is not None:
+    stats.stop()
+    # the second build only reads the files the first one could read
+    loaded = [fname for fname, starts in zip(index.files.paths, line_starts) if starts is not None]
+    stats.memory = traced_memory(lambda: build_index_from_files(loaded))
+    print(stats.report())
+latencies = LatencyHistogram()
 
 while True:
     query = input("\nEnter a string to search (or 'quit' to exit): ").lower()
     if query == "quit":
         break
 
+    start = time.perf_counter()
     files = search_word(index, query)
+    latencies.record(time.perf_counter() - start)
     if not files:
         print(f"No occurrences of '{query}' found.")
     else:
         print(f"\n'{query}' found in {len(files)} file(s):")
-        search_in_files(query, files)
\ No newline at end of file
+        search_in_files(index, line_starts, query)
+
+if stats is not None:
+    print(f"Searches: {latencies.summary()}")
@@ -0,0 +1,89 @@
+"""
+Tutorial: Streaming tokenizer
+
+Splits text into lowercase words, punctuation being treated as spaces,
+the same way the indexers always did, but:
+- punctuation is replaced with a translation table when a chunk is pure
+  ASCII, the fastest way for such text; str.translate() is much slower on
+  other text (accented letters), which keeps the chained str.replace() calls;
+- files are read in fixed-size chunks and words are yielded one at a time,
+  so memory stays bounded even for multi-GB files. A word cut in two by a
+  chunk boundary is carried over to the next chunk.
+
+When the position of the words matters, tokenize_lines() reads a file line by
+line and also returns the byte offset where each line starts.
+
+Usage:
+    from tokenizer import tokenize, tokenize_file
+    for word in tokenize_file("notes.txt"):
+        print(word)
+"""
+
+import string
+
+
+CHUNK_SIZE = 1 << 16
+
+PUNCTUATION = str.maketrans(string.punctuation, " " * len(string.punctuation))
+
+
+def normalize(text):
+    """Lowercase a text and replace punctuation with spaces."""
+    text = text.lower()
+    if text.isascii():
+        return text.translate(PUNCTUATION)
+    for ch in string.punctuation:
+        if ch in text:
+            text = text.replace(ch, " ")
+    return text
+
+
+def tokenize(text):
+    """Return the list of words of a text."""
+    return normalize(text).split()
+
+
+def iter_tokens(f, chunk_size=CHUNK_SIZE):
+    """Yield the words of an open text file, reading it chunk by chunk."""
+    carry = ""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        text = carry + normalize(chunk)
+        words = text.split()
+        # the last word may continue in the next chunk
+        if words and not text[-1].isspace():
+            carry = words.pop()
+        else:
+            carry = ""
+        yield from words
+    if carry:
+        yield carry
+
+
+def tokenize_file(filename, chunk_size=CHUNK_SIZE, encoding="utf-8"):
+    """
+    Return a generator over the words of a file.
+    The file is opened right away, so a missing file raises FileNotFoundError
+    here; decoding errors are raised while iterating.
+    """
+    f = open(filename, "r", encoding=encoding)
+
+    def words():
+        with f:
+            yield from iter_tokens(f, chunk_size)
+
+    return words()
+
+
+def tokenize_lines(filename, encoding="utf-8"):
+    """
+    Yield (offset, words) for each line of a file, 'offset' being the
+    position in bytes of the start of the line.
+    """
+    with open(filename, "rb") as f:
+        offset = 0
+        for raw in f:
+            yield offset, tokenize(raw.decode(encoding))
+            offset += len(raw)
@@ -0,0 +1,286 @@
+"""
+Tutorial: Compact word trie
+
+A memory-friendly replacement for the nested-dictionary index tree:
+- nodes are integer IDs (the root is 0) and are stored in flat parallel
+  arrays instead of one Python object per node: the letter of the edge leading
+  to the node, its first child, its next sibling and the largest number of
+  postings in its subtree, about 20 bytes per node;
+- file paths are interned once into a FileTable and referenced by integer IDs;
+- a word found in a single file (most words of real texts) keeps that file ID
+  directly in the node; the others use a sorted array('I') of file IDs.
+
+Files are usually indexed one after the other, so file IDs only grow and
+checking for a duplicate posting is a comparison with the last element:
+inserting a word costs O(len(word)) steps along the sibling lists.
+
+Usage:
+    from trie import Trie, FileTable
+"""
+
+from array import array
+from bisect import bisect_left
+
+
+NONE = -1       # no node / no posting
+
+
+class FileTable:
+    """Intern file paths into consecutive integer IDs."""
+
+    __slots__ = ("ids", "paths")
+
+    def __init__(self):
+        self.ids = {}
+        self.paths = []
+
+    def intern(self, path):
+        """Return the ID of 'path', assigning a new one on first use."""
+        file_id = self.ids.get(path)
+        if file_id is None:
+            file_id = len(self.paths)
+            self.ids[path] = file_id
+            self.paths.append(path)
+        return file_id
+
+    def path(self, file_id):
+        """Return the path of a file ID."""
+        return self.paths[file_id]
+
+    def __len__(self):
+        return len(self.paths)
+
+
+class Trie:
+    """Word trie mapping each word to the sorted IDs of the files containing it."""
+
+    root = 0
+
+    def __init__(self, files=None):
+        self.files = files if files is not None else FileTable()
+        self.letters = array("I", [0])      # code point of the edge leading to each node
+        self.first = array("i", [NONE])     # first child of each node
+        self.sibling = array("i", [NONE])   # next child of the same parent
+        self.best = array("I", [0])         # largest number of postings in the subtree
+        # file ID if the word ending here is in a single file, NONE if no word
+        # ends here, otherwise -2 - (index of its array in self.overflow)
+        self.post = array("i", [NONE])
+        self.overflow = []
+        self.lines = {}                     # optional, node -> array('I') of line numbers per posting
+        self.frozen = False
+        self.posting_count = 0              # (word, file) entries
+
+    @property
+    def node_count(self):
+        return len(self.letters)
+
+    def child(self, node, letter):
+        """Return the child of 'node' reached by 'letter', or None."""
+        code = ord(letter)
+        letters = self.letters
+        sibling = self.sibling
+        child = self.first[node]
+        while child != NONE:
+            if letters[child] == code:
+                return child
+            child = sibling[child]
+        return None
+
+    def children(self, node):
+        """Yield (letter, child) for the children of 'node', in insertion order."""
+        child = self.first[node]
+        while child != NONE:
+            yield chr(self.letters[child]), child
+            child = self.sibling[child]
+
+    def _new_node(self, code):
+        self.letters.append(code)
+        self.first.append(NONE)
+        self.sibling.append(NONE)
+        self.best.append(0)
+        self.post.append(NONE)
+        return len(self.letters) - 1
+
+    def postings(self, node):
+        """Return the sorted array of file IDs of the word ending at 'node', or None."""
+        value = self.post[node]
+        if value == NONE:
+            return None
+        if value >= 0:
+            return array("I", [value])
+        return self.overflow[-2 - value]
+
+    def posting_length(self, node):
+        value = self.post[node]
+        if value == NONE:
+            return 0
+        if value >= 0:
+            return 1
+        return len(self.overflow[-2 - value])
+
+    def add(self, word, file_id, lines=None):
+        """
+        Record that 'word' occurs in file 'file_id', optionally on the given
+        sorted line numbers (give them for every posting or for none).
+        """
+        if self.frozen:
+            raise ValueError("cannot add words to a minimized trie")
+        letters = self.letters
+        sibling = self.sibling
+        path = []
+        node = 0
+        for letter in word:
+            path.append(node)
+            code = ord(letter)
+            child = self.first[node]
+            last = NONE
+            while child != NONE and letters[child] != code:
+                last = child
+                child = sibling[child]
+            if child == NONE:
+                # appended last, so a child or next sibling always has a larger ID
+                child = self._new_node(code)
+                if last == NONE:
+                    self.first[node] = child
+                else:
+                    sibling[last] = child
+            node = child
+
+        pos, new = self._add_posting(node, file_id)
+        if lines is not None:
+            node_lines = self.lines.setdefault(node, [])
+            if new:
+                node_lines.insert(pos, array("I", lines))
+            else:
+                node_lines[pos] = array("I", sorted(set(node_lines[pos]).union(lines)))
+        if not new:
+            return node
+        self.posting_count += 1
+
+        # keep the subtree maxima used by the ranked prefix queries
+        count = self.posting_length(node)
+        best = self.best
+        if best[node] < count:
+            best[node] = count
+            for parent in reversed(path):
+                if best[parent] >= count:
+                    break
+                best[parent] = count
+        return node
+
+    def _add_posting(self, node, file_id):
+        """Add file_id to the postings of 'node'; return (position, whether it is new)."""
+        value = self.post[node]
+        if value == NONE:
+            self.post[node] = file_id
+            return 0, True
+        if value >= 0:
+            if value == file_id:
+                return 0, False
+            postings = array("I", sorted((value, file_id)))
+            self.post[node] = -2 - len(self.overflow)
+            self.overflow.append(postings)
+            return postings.index(file_id), True
+        postings = self.overflow[-2 - value]
+        if postings[-1] < file_id:
+            postings.append(file_id)
+            return len(postings) - 1, True
+        # a file indexed again, or out of order
+        pos = bisect_left(postings, file_id)
+        if postings[pos] == file_id:
+            return pos, False
+        postings.insert(pos, file_id)
+        return pos, True
+
+    def add_file_words(self, words, filename):
+        """Add every word of an iterable, all coming from the same file."""
+        file_id = self.files.intern(filename)
+        for word in words:
+            self.add(word, file_id)
+        return file_id
+
+    def find(self, word):
+        """Return the node reached by 'word', or None."""
+        node = 0
+        for letter in word:
+            node = self.child(node, letter)
+            if node is None:
+                return None
+        return node
+
+    def file_ids(self, word):
+        """Return the array of file IDs containing 'word' (empty if not found)."""
+        node = self.find(word)
+        if node is None:
+            return array("I")
+        return self.postings(node) or array("I")
+
+    def search(self, word):
+        """Return the list of file paths containing 'word'."""
+        return [self.files.path(i) for i in self.file_ids(word)]
+
+    def words(self, node=None, prefix=""):
+        """Yield (word, postings) for every word below 'node', in insertion order."""
+        stack = [(0 if node is None else node, prefix)]
+        while stack:
+            node, word = stack.pop()
+            postings = self.postings(node)
+            if postings is not None:
+                yield word, postings
+            for letter, child in reversed(list(self.children(node))):
+                stack.append((child, word + letter))
+
+    def minimize(self):
+        """
+        Share identical subtrees (same letters, same postings below) so that
+        common suffixes are stored once, turning the trie into a DAWG.
+        The trie becomes read-only afterwards. Return the number of nodes.
+        """
+        first, sibling, post = self.first, self.sibling, self.post
+        canonical = array("i", bytes(4 * len(self.letters)))
+        registry = {}
+        # children and next siblings have larger IDs than their node, so a
+        # walk by decreasing IDs visits them first (a post-order without recursion)
+        for node in range(len(self.letters) - 1, -1, -1):
+            if first[node] != NONE:
+                first[node] = canonical[first[node]]
+            if sibling[node] != NONE:
+                sibling[node] = canonical[sibling[node]]
+            value = post[node]
+            postings = value if value > -2 else self.overflow[-2 - value].tobytes()
+            lines = self.lines.get(node)
+            if lines is not None:
+                lines = tuple(a.tobytes() for a in lines)
+            # the key includes the next sibling: a shared node shares the rest of its list
+            key = (self.letters[node], first[node], sibling[node], postings, lines)
+            canonical[node] = registry.setdefault(key, node)
+        self._compact(canonical[0])
+        self.frozen = True
+        return len(self.letters)
+
+    def _compact(self, root):
+        """Renumber the nodes reachable from 'root' into fresh arrays, root first."""
+        numbers = {root: 0}
+        order = [root]
+        for node in order:
+            for target in (self.first[node], self.sibling[node]):
+                if target != NONE and target not in numbers:
+                    numbers[target] = len(order)
+                    order.append(target)
+
+        overflow = []
+        post = array("i")
+        for node in order:
+            value = self.post[node]
+            if value <= -2:
+                post.append(-2 - len(overflow))
+                overflow.append(self.overflow[-2 - value])
+            else:
+                post.append(value)
+        self.letters = array("I", (self.letters[node] for node in order))
+        self.first = array("i", (numbers.get(self.first[node], NONE) for node in order))
+        self.sibling = array("i", (numbers.get(self.sibling[node], NONE) for node in order))
+        self.best = array("I", (self.best[node] for node in order))
+        self.post = post
+        self.overflow = overflow
+        self.lines = {numbers[node]: lines for node, lines in self.lines.items() if node in numbers}
@@ -0,0 +1,175 @@
+"""
+Tutorial: Prefix, wildcard and fuzzy queries over the word trie
+
+All queries walk the trie (see trie.py) and prune branches as soon as they
+cannot lead to a match, instead of testing every word of the vocabulary:
+- prefix_search: best-first walk ordered by the subtree maxima kept in each
+  node, so the N most frequent completions are found without enumerating all;
+- wildcard_search: '?' matches one letter, '*' any sequence of letters;
+- fuzzy_search: runs a Levenshtein automaton along the trie edges, built lazily,
+  computing only the diagonal band of cells that can stay within the distance,
+  and stops descending when every cell of the band exceeds it.
+
+Usage:
+    from trie_queries import prefix_search, wildcard_search, fuzzy_search
+"""
+
+import heapq
+
+
+def prefix_search(trie, prefix, top_n=10):
+    """Return up to top_n (word, postings) starting with 'prefix', most frequent first."""
+    start = trie.find(prefix)
+    if start is None:
+        return []
+
+    results = []
+    counter = 0  # tie-breaker, keeps equal counts in insertion order
+    heap = [(-trie.best[start], counter, prefix, start, False)]
+    while heap and len(results) < top_n:
+        _, _, word, node, is_word = heapq.heappop(heap)
+        if is_word:
+            results.append((word, trie.postings(node)))
+            continue
+        count = trie.posting_length(node)
+        if count:
+            counter += 1
+            heapq.heappush(heap, (-count, counter, word, node, True))
+        for letter, child in trie.children(node):
+            counter += 1
+            heapq.heappush(heap, (-trie.best[child], counter, word + letter, child, False))
+    return results
+
+
+def wildcard_search(trie, pattern, limit=None):
+    """Return (word, postings) matching a pattern with '?' and '*' jokers."""
+    # consecutive stars are equivalent to a single one
+    while "**" in pattern:
+        pattern = pattern.replace("**", "*")
+
+    results = []
+    # (prefix, position) identifies a state even when the trie is minimized
+    seen = set()
+    stack = [(trie.root, 0, "")]
+    while stack:
+        node, i, word = stack.pop()
+        if (word, i) in seen:
+            continue
+        seen.add((word, i))
+
+        if i == len(pattern):
+            postings = trie.postings(node)
+            if postings is not None:
+                results.append((word, postings))
+                if limit is not None and len(results) >= limit:
+                    break
+            continue
+
+        symbol = pattern[i]
+        if symbol == "*":
+            # the star matches nothing, or one more letter and stays active
+            stack.append((node, i + 1, word))
+            for letter, child in trie.children(node):
+                stack.append((child, i, word + letter))
+        elif symbol == "?":
+            for letter, child in trie.children(node):
+                stack.append((child, i + 1, word + letter))
+        else:
+            child = trie.child(node, symbol)
+            if child is not None:
+                stack.append((child, i + 1, word + symbol))
+    return sorted(results)
+
+
+def _fuzzy_walk(trie, word, max_distance):
+    """Return every (word, distance, postings) within max_distance edits of 'word'."""
+    n = len(word)
+    bound = max_distance + 1
+    codes = [ord(c) for c in word]
+    first, sibling, letters, post = trie.first, trie.sibling, trie.letters, trie.post
+    results = []
+
+    # At depth i only the columns i - max_distance .. i + max_distance can
+    # stay within the bound, so a row is kept as that band, values capped at
+    # bound. The (depth, band) pairs are the states of a Levenshtein
+    # automaton, numbered as they are met; the transitions already computed
+    # are cached, as most trie edges repeat a (state, letter) pair.
+    states = {}         # (depth, band) -> state number
+    info = []           # state number -> (depth, band, distance of the word or None, allowed letters)
+    transitions = {}    # state number * 0x110000 + letter code -> state number, or -1 if dead
+
+    def state(depth, band):
+        key = (depth, band)
+        number = states.get(key)
+        if number is None:
+            number = states[key] = len(info)
+            low = max(0, depth - max_distance)
+            distance = band[-1] if low + len(band) == n + 1 and band[-1] <= max_distance else None
+            # with no edit left, only a letter following a cell at the bound
+            # can keep a cell within it
+            allowed = None
+            if min(band) == max_distance:
+                allowed = {codes[low + k] for k, value in enumerate(band)
+                           if value == max_distance and low + k < n}
+            info.append((depth, band, distance, allowed))
+        return number
+
+    def step(number, code):
+        depth, band, _, _ = info[number]
+        low = max(0, depth - max_distance)
+        depth += 1
+        new_low = max(0, depth - max_distance)
+        high = min(n, depth + max_distance)
+        new_band = []
+        for col in range(new_low, high + 1):
+            k = col - low
+            # deletion (cell above), substitution (diagonal), insertion (left)
+            value = band[k] + 1 if k < len(band) else bound
+            if col:
+                if 0 < k <= len(band):
+                    value = min(value, band[k - 1] + (codes[col - 1] != code))
+                if new_band:
+                    value = min(value, new_band[-1] + 1)
+            new_band.append(min(value, bound))
+        # no completion of this prefix can come back under the bound
+        if not new_band or min(new_band) > max_distance:
+            return -1
+        return state(depth, tuple(new_band))
+
+    stack = [(trie.root, "", state(0, tuple(range(min(n, max_distance) + 1))))]
+    while stack:
+        node, prefix, number = stack.pop()
+        _, _, distance, allowed = info[number]
+        if distance is not None and post[node] != -1:
+            results.append((prefix, distance, trie.postings(node)))
+        base = number * 0x110000
+        child = first[node]
+        while child != -1:
+            code = letters[child]
+            if allowed is None or code in allowed:
+                target = transitions.get(base + code)
+                if target is None:
+                    target = transitions[base + code] = step(number, code)
+                if target != -1:
+                    stack.append((child, prefix + chr(code), target))
+            child = sibling[child]
+    return results
+
+
+def fuzzy_search(trie, word, max_distance=1, limit=None):
+    """
+    Return (word, distance, postings) within max_distance edits of 'word',
+    closest first, then most frequent first.
+    With a limit, the distances are tried in increasing order and the search
+    stops at the first one giving enough results: a larger distance would
+    only add results ranked after them, and costs much more to explore.
+    """
+    distances = range(max_distance + 1) if limit is not None else [max_distance]
+    for distance in distances:
+        results = _fuzzy_walk(trie, word, distance)
+        if limit is not None and len(results) >= limit:
+            break
+    results.sort(key=lambda r: (r[1], -len(r[2]), r[0]))
+    if limit is not None:
+        results = results[:limit]
+    return results
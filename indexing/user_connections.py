@@ -1,48 +1,40 @@
 """
-Tutorial: User connection log analysis (using the 'last' command)
+Tutorial: User connection log analysis (reading wtmp directly)
 
-Parses the system command 'last' to extract user connection information.
+Reads the login history that the 'last' command displays, straight from the
+binary wtmp files (see wtmp_reader.py), to extract user connection information.
 Builds a nested dictionary structure:
     {login: {date: [durations_in_minutes, ...]}}
 
 Usage:
-    python user_connections.py
+    python user_connections.py [wtmp_file]
 """
 
-import subprocess
-import re
+import sys
+import time
 
-# Run the "last" command and get its output as text
-result = subprocess.run(["last"], capture_output=True, text=True)
-output = result.stdout
+from wtmp_reader import WTMP_PATH, read_sessions, wtmp_files
+
+path = sys.argv[1] if len(sys.argv) > 1 else WTMP_PATH
 
 data = {}
 
-# Loop over each line of the result
-for line in output.splitlines():
-    # Example line: thomas tty2 tty2 Mon Sep 8 08:47 - down (09:18)
-    regex = r"^(\w+).*\s(\w{3})\s(\d{1,2}).*\((\d{2}):(\d{2})\)"
-    match = re.search(regex, line)
-
-    if match:
-        login = match[1]
-        month = match[2]
-        day = match[3]
-        date = f"{month} {day}"
-        hours = int(match[4])
-        minutes = int(match[5])
-        duration = hours * 60 + minutes
-
-        if login not in data:
-            data[login] = {}
-        if date not in data[login]:
-            data[login][date] = []
-        data[login][date].append(duration)
+# Loop over each completed session, oldest first
+for session in read_sessions(wtmp_files(path)):
+    login = session.user
+    date = time.strftime("%Y-%m-%d", time.localtime(session.start))
+    duration = (session.end - session.start) / 60
+
+    if login not in data:
+        data[login] = {}
+    if date not in data[login]:
+        data[login][date] = []
+    data[login][date].append(duration)
 
 # Example of data structure:
 # data = {
-#     "login1": {"Sep 8": [12, 18], "Sep 7": [45]},
-#     "login2": {"Sep 8": [30]}
+#     "login1": {"2025-09-08": [12.5, 18.0], "2025-09-07": [45.2]},
+#     "login2": {"2025-09-08": [30.0]}
 # }
 
 for login, dates in data.items():
@@ -34,61 +34,83 @@ print(index)
 """
 Tutorial: Word indexing (step 2)
 
-Reads one or more text files, extracts words, and builds a tree-based index (nested dictionaries) referencing which files contain each word.
-Then allows the user to search for a word interactively.
+Reads one or more text files, extracts words, and builds a compact tree-based index (see trie.py) referencing which files contain each word.
+Then allows the user to search for a word interactively:
+    word      exact match
+    pre*      the 10 most frequent words starting with 'pre'
+    c?a*t     wildcard match ('?' one letter, '*' any letters)
+    word~2    words within 2 edits of 'word' ('word~' means 1 edit)
+
+With --stats, prints the time spent reading, tokenizing and inserting, the
+size of the trie and the memory it takes (measured during a second build, so
+that tracing does not slow down the timed one), then the latency of each kind
+of query when quitting.
 
 Usage:
-    python script.py file1.txt file2.txt ...
+    python script.py [--stats] file1.txt file2.txt ...
 """
 
 import sys
-import string
+import time
 
+from instrumentation import BuildStats, LatencyHistogram, add_file_timed, traced_memory
+from tokenizer import tokenize_file
+from trie import Trie
+from trie_queries import prefix_search, wildcard_search, fuzzy_search
 
-def add_word(index, word, filename):
-    """Add a word into the index tree, referencing the file that contains it."""
-    node = index
-    for letter in word:
-        if letter not in node:
-            node[letter] = {}
-        node = node[letter]
 
-    # At the end of the word, record the filename
-    if "files" not in node:
-        node["files"] = []
-    if filename not in node["files"]:
-        node["files"].append(filename)
+def add_word(index, word, filename):
+    """Add a word into the index trie, referencing the file that contains it."""
+    file_id = index.files.intern(filename)
+    index.add(word, file_id)
 
 
-def build_index_from_files(filenames):
-    """Read all files and build the full index tree."""
-    index = {}
-    for fname in filenames:
+def build_index_from_files(filenames, stats=None):
+    """Read all files and build the full index trie, timing its phases into 'stats' if given."""
+    index = Trie()
+    # a file given twice is indexed once
+    for fname in dict.fromkeys(filenames):
         try:
-            with open(fname, "r", encoding="utf-8") as f:
-                text = f.read().lower()
-                for ch in string.punctuation:
-                    text = text.replace(ch, " ")
-                words = text.split()
-                for word in words:
-                    add_word(index, word, fname)
+            if stats is None:
+                index.add_file_words(tokenize_file(fname), fname)
+            else:
+                add_file_timed(index, fname, stats)
         except FileNotFoundError:
             print(f"File not found: {fname}")
+    if stats is not None:
+        stats.count("nodes", index.node_count)
+        stats.count("postings", index.posting_count)
     return index
 
 
 def search_word(index, word):
     """Return the list of files containing a given word, or None if not found."""
-    node = index
-    for letter in word:
-        if letter not in node:
-            return None
-        node = node[letter]
-    return node.get("files", [])
-
-
-files = sys.argv[1:]
-index = build_index_from_files(files)
+    node = index.find(word)
+    if node is None:
+        return None
+    return [index.files.path(i) for i in index.postings(node) or []]
+
+
+files = [arg for arg in sys.argv[1:] if arg != "--stats"]
+stats = BuildStats() if "--stats" in sys.argv[1:] else None
+index = build_index_from_files(files, stats)
+if stats is None:
+    index.minimize()
+else:
+    with stats.phase("minimize"):
+        index.minimize()
+    stats.stop()
+
+    def build():
+        # only the files found by the first build, so that those missing are
+        # not reported twice (a path is interned once its file is opened)
+        traced = build_index_from_files(index.files.paths)
+        traced.minimize()
+        return traced
+
+    stats.memory = traced_memory(build)
+    print(stats.report())
+latencies = {}
 
 
 while True:
@@ -96,8 +118,36 @@ while True:
     if query == "quit":
         break
 
-    result = search_word(index, query)
-    if not result:
-        print(f"'{query}' not found in any file.")
+    start = time.perf_counter()
+    if "~" in query:
+        kind = "fuzzy"
+        word, _, dist = query.partition("~")
+        matches = fuzzy_search(index, word, int(dist) if dist.isdigit() else 1)
+        matches = [(w, p) for w, _, p in matches]
+    elif query.endswith("*") and "*" not in query[:-1] and "?" not in query:
+        kind = "prefix"
+        matches = prefix_search(index, query[:-1], top_n=10)
+    elif "*" in query or "?" in query:
+        kind = "wildcard"
+        matches = wildcard_search(index, query)
     else:
-        print(f"'{query}' found in: {result}")
\ No newline at end of file
+        kind = "exact"
+        result = search_word(index, query)
+    if stats is not None:
+        latencies.setdefault(kind, LatencyHistogram()).record(time.perf_counter() - start)
+
+    if kind == "exact":
+        if not result:
+            print(f"'{query}' not found in any file.")
+        else:
+            print(f"'{query}' found in: {result}")
+        continue
+
+    if not matches:
+        print(f"No word matches '{query}'.")
+    for word, postings in matches:
+        print(f"'{word}' found in: {[index.files.path(i) for i in postings]}")
+
+if stats is not None:
+    for kind, histogram in sorted(latencies.items()):
+        print(f"{kind:8} {histogram.summary()}")
@@ -0,0 +1,161 @@
+"""
+Tutorial: Reading the login history (wtmp) directly
+
+The 'last' command reads /var/log/wtmp, a sequence of fixed-size binary
+records (struct utmp, 384 bytes on Linux). This module decodes them itself:
+- the file is mapped in memory and decoded with struct.iter_unpack, without
+  going through the text output of 'last';
+- login and logout records are paired into sessions in a single pass, with
+  timestamps to the microsecond (and the year!);
+- rotated files (wtmp.1, wtmp.2, ..., possibly gzipped) are read oldest first.
+
+pack_record() and write_wtmp() build synthetic files, for testing.
+
+Usage:
+    from wtmp_reader import read_sessions, wtmp_files
+    for session in read_sessions(wtmp_files()):
+        print(session.user, session.start, session.end)
+"""
+
+import gzip
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+
+# struct utmp from glibc on Linux (same layout on 32 and 64 bit)
+UTMP = struct.Struct("<h2xi32s4s32s256shhiii4i20x")
+RECORD_SIZE = UTMP.size
+
+# ut_type values
+RUN_LVL = 1
+BOOT_TIME = 2
+USER_PROCESS = 7
+DEAD_PROCESS = 8
+
+WTMP_PATH = "/var/log/wtmp"
+
+Record = namedtuple("Record", "type pid line user host time")
+Session = namedtuple("Session", "user line host start end")
+
+
+def _text(raw):
+    """Decode a NUL-padded C string."""
+    return raw.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+
+
+def complete_size(path):
+    """Return the size of a file, rounded down to a whole number of records."""
+    size = os.path.getsize(path)
+    return size - size % RECORD_SIZE
+
+
+def iter_records(path, start=0, end=None):
+    """
+    Yield the login-related records of a wtmp file between byte offsets
+    'start' and 'end' (by default, up to the last complete record).
+    """
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            data = f.read()
+        yield from _decode(memoryview(data), start, end)
+        return
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= start:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            try:
+                yield from _decode(view, start, end)
+            finally:
+                view.release()
+
+
+def _decode(view, start, end):
+    if end is None:
+        end = len(view)
+    end = min(end, len(view))
+    end -= (end - start) % RECORD_SIZE
+    if end <= start:
+        return
+    chunk = view[start:end]
+    unpacked = UTMP.iter_unpack(chunk)
+    try:
+        for (ut_type, pid, line, _, user, host, _, _, _, sec, usec, *_) in unpacked:
+            if ut_type in (USER_PROCESS, DEAD_PROCESS, BOOT_TIME, RUN_LVL):
+                yield Record(ut_type, pid, _text(line), _text(user), _text(host),
+                             sec + usec / 1e6)
+    finally:
+        # the mapping can only be closed once no view on it is left
+        del unpacked
+        chunk.release()
+
+
+def pair_sessions(records, open_sessions=None):
+    """
+    Turn a time-ordered stream of records into completed sessions.
+    'open_sessions' maps a terminal to the (user, host, start) of a login not
+    yet closed; pass the same dictionary to continue reading later records.
+    """
+    if open_sessions is None:
+        open_sessions = {}
+    for record in records:
+        if record.type == USER_PROCESS:
+            # a new login on a busy terminal ends the previous session
+            previous = open_sessions.pop(record.line, None)
+            if previous is not None:
+                yield Session(previous[0], record.line, previous[1], previous[2], record.time)
+            open_sessions[record.line] = (record.user, record.host, record.time)
+        elif record.type == DEAD_PROCESS:
+            previous = open_sessions.pop(record.line, None)
+            if previous is not None:
+                yield Session(previous[0], record.line, previous[1], previous[2], record.time)
+        elif record.type == BOOT_TIME or record.user == "shutdown":
+            # reboot or shutdown: every open session ends here
+            for line, (user, host, start) in sorted(open_sessions.items()):
+                yield Session(user, line, host, start, record.time)
+            open_sessions.clear()
+
+
+def wtmp_files(path=WTMP_PATH):
+    """Return the existing wtmp file and its rotations, oldest first."""
+    rotated = []
+    n = 1
+    while True:
+        for candidate in (f"{path}.{n}", f"{path}.{n}.gz"):
+            if os.path.exists(candidate):
+                rotated.append(candidate)
+                break
+        else:
+            break
+        n += 1
+    files = list(reversed(rotated))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_sessions(paths, open_sessions=None):
+    """Yield the completed sessions of several wtmp files, read in order."""
+    def records():
+        for path in paths:
+            yield from iter_records(path)
+
+    yield from pair_sessions(records(), open_sessions)
+
+
+def pack_record(ut_type, line, user="", when=0.0, host="", pid=0):
+    """Return the bytes of one utmp record."""
+    sec = int(when)
+    usec = int(round((when - sec) * 1e6))
+    return UTMP.pack(ut_type, pid, line.encode(), line[-4:].encode(), user.encode(),
+                     host.encode(), 0, 0, 0, sec, usec, 0, 0, 0, 0)
+
+
+def write_wtmp(path, records):
+    """Write a wtmp file from (ut_type, line, user, when[, host]) tuples."""
+    with open(path, "wb") as f:
+        for record in records:
+            f.write(pack_record(*record))
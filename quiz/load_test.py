@@ -0,0 +1,94 @@
+"""
+Tutorial: Load test of the quiz server
+Simulates many players answering quizzes at the same time, and reports
+the latency percentiles of the server answers (from an answer sent to its
+feedback received).
+Each simulated player connects, asks for n questions and answers each of
+them, correctly about half of the time.
+
+Usage:
+    python load_test.py clients questions [host:port]
+Without an address, a quiz server is started in the same process.
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from quiz_server import load_dataset, normalize, serve
+
+
+def percentile(ordered, p):
+    """Return the p-th percentile of a sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+async def player(host, port, n, capitals, latencies, limit):
+    """Play one quiz, recording the time from each answer sent to its feedback."""
+    async with limit:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            await reader.readline()
+            writer.write(f"{n}\n".encode())
+            await writer.drain()
+            while True:
+                line = (await reader.readline()).decode("utf-8")
+                if not line or line.startswith("Final score"):
+                    return bool(line)
+                country = line.split("capital of ", 1)[1].rstrip("?\n")
+                answer = capitals.get(normalize(country), "?")
+                if random.random() < 0.5:
+                    answer = "wrong"
+                start = time.perf_counter()
+                writer.write(answer.encode("utf-8") + b"\n")
+                await writer.drain()
+                # the next question follows the feedback without a request
+                if not await reader.readline():
+                    return False
+                latencies.append(time.perf_counter() - start)
+        except (ConnectionError, IndexError):
+            return False
+        finally:
+            writer.close()
+
+
+async def main(clients, n, address=None):
+    dataset = load_dataset()
+    server = None
+    if address is None:
+        host, port = "127.0.0.1", 8767
+        server = asyncio.create_task(serve(dataset, host, port))
+        await asyncio.sleep(0.1)
+    else:
+        host, port = address.rsplit(":", 1)
+        port = int(port)
+
+    capitals = {normalize(country): capital for country, capital in dataset.questions}
+    latencies = []
+    # bound the number of sockets open at once
+    limit = asyncio.Semaphore(1000)
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(player(host, port, n, capitals, latencies, limit) for _ in range(clients)),
+        return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.cancel()
+
+    completed = sum(1 for r in results if r is True)
+    latencies.sort()
+    print(f"{completed}/{clients} quizzes completed in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.0f} answers/s)")
+    for p in (50, 90, 95, 99):
+        print(f"  p{p}: {percentile(latencies, p) * 1000:.2f} ms")
+    print(f"  max: {(latencies[-1] if latencies else 0) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    address = sys.argv[3] if len(sys.argv) > 3 else None
+    asyncio.run(main(clients, n, address))
@@ -0,0 +1,155 @@
+"""
+Tutorial: Geography quiz server
+The CSV file of countries and capitals is read once, into immutable tables:
+- the list of (country, capital) questions;
+- country >> capitals and capital >> countries dictionaries whose keys and
+  values are already normalized (case-folded, spaces collapsed), so checking
+  an answer is a single dictionary lookup.
+Then many players are served at the same time with asyncio, each with their
+own shuffled questions and score. The dialogue is line based (try it with
+'nc localhost 8766'):
+    server: How many questions? (add 'inv' for capital >> country)
+    client: 5 inv
+    server: Question 1: Which country has Kaboul as its capital?
+    client: Afghanistan
+    server: Correct!
+    ...
+    server: Final score: 4/5 (80%)
+"""
+
+import asyncio
+import os
+import random
+import sys
+from collections import namedtuple
+from types import MappingProxyType
+
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "capitals.csv")
+
+# answers[i] holds the accepted normalized (capitals, countries) of questions[i]
+Dataset = namedtuple("Dataset", "questions answers capitals_of countries_of")
+
+
+def normalize(answer):
+    """Return the canonical form of an answer: case-folded, single spaces."""
+    return " ".join(answer.split()).casefold()
+
+
+def load_dataset(filename=DATASET):
+    """
+    Read the CSV file and return a Dataset: the tuple of (country, capital)
+    pairs, the accepted answers of each of them, and two read-only dictionaries
+    from a normalized country (capital) to the normalized capitals (countries).
+    """
+    questions = []
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            data = line.strip().split(",")
+            if len(data) == 2:
+                country = data[0].split("(")[0].strip()
+                capital = data[1].strip()
+                questions.append((country, capital))
+
+    capitals_of = {}
+    countries_of = {}
+    for country, capital in questions:
+        capitals_of.setdefault(normalize(country), set()).add(normalize(capital))
+        countries_of.setdefault(normalize(capital), set()).add(normalize(country))
+
+    capitals_of = MappingProxyType({k: frozenset(v) for k, v in capitals_of.items()})
+    countries_of = MappingProxyType({k: frozenset(v) for k, v in countries_of.items()})
+    answers = tuple((capitals_of[normalize(country)], countries_of[normalize(capital)])
+                    for country, capital in questions)
+    return Dataset(tuple(questions), answers, capitals_of, countries_of)
+
+
+class QuizSession:
+    """The questions and score of one player."""
+
+    def __init__(self, dataset, n, reverse_mode=False, seed=None):
+        self.questions = dataset.questions
+        self.answers = dataset.answers
+        rng = random.Random(seed)
+        # shuffle indices only: the dataset itself is shared by every session
+        self.order = rng.sample(range(len(self.questions)), min(n, len(self.questions)))
+        self.reverse_mode = reverse_mode
+        self.current = 0
+        self.score = 0
+
+    def finished(self):
+        return self.current >= len(self.order)
+
+    def question(self):
+        """Return the text of the current question."""
+        country, capital = self.questions[self.order[self.current]]
+        if not self.reverse_mode:
+            return f"Question {self.current + 1}: What is the capital of {country}?"
+        return f"Question {self.current + 1}: Which country has {capital} as its capital?"
+
+    def answer(self, text):
+        """Check an answer to the current question; return (correct, expected)."""
+        idx = self.order[self.current]
+        capitals, countries = self.answers[idx]
+        if not self.reverse_mode:
+            correct = normalize(text) in capitals
+            expected = self.questions[idx][1]
+        else:
+            correct = normalize(text) in countries
+            expected = self.questions[idx][0]
+        self.current += 1
+        if correct:
+            self.score += 1
+        return correct, expected
+
+    def final_score(self):
+        n = len(self.order)
+        return f"Final score: {self.score}/{n} ({self.score / n * 100 if n else 0:.0f}%)"
+
+
+async def play(dataset, reader, writer):
+    """Run one quiz over a connection."""
+
+    async def send(text):
+        writer.write(text.encode("utf-8") + b"\n")
+        await writer.drain()
+
+    try:
+        await send("How many questions? (add 'inv' for capital >> country)")
+        request = (await reader.readline()).decode("utf-8", errors="ignore").split()
+        if not request or not request[0].isdigit():
+            await send("Expected a number of questions.")
+            return
+        reverse_mode = len(request) > 1 and request[1].lower() == "inv"
+        session = QuizSession(dataset, int(request[0]), reverse_mode)
+
+        while not session.finished():
+            await send(session.question())
+            line = await reader.readline()
+            if not line:
+                return
+            correct, expected = session.answer(line.decode("utf-8", errors="ignore"))
+            await send("Correct!" if correct else f"Wrong. The correct answer was {expected}.")
+        await send(session.final_score())
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(dataset, host="127.0.0.1", port=8766):
+    """Serve quizzes until cancelled."""
+    server = await asyncio.start_server(
+        lambda reader, writer: play(dataset, reader, writer), host, port, backlog=4096)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8766
+    dataset = load_dataset()
+    print(f"Loaded {len(dataset.questions)} questions, serving on port {port}.")
+    try:
+        asyncio.run(serve(dataset, port=port))
+    except KeyboardInterrupt:
+        pass